@@ -0,0 +1,175 @@
+"""asyncio runtime for a SensorSystem.
+
+Every sensor is a coroutine. It triggers a ping and then awaits the echo's
+edge events, which the event loop reads from the echo line's file descriptor
+(loop.add_reader). There is no thread per sensor and no polling. One
+asyncio.Lock hands the ping slot to the sensors in turn. asyncio locks wake
+their waiters in FIFO order, so this keeps SensorScheduler's round-robin: one
+echo in flight at a time, slot_time apart.
+
+Hits are published to subscribers: asyncio queues from subscribe(), or
+`async def handler(sensor_id, timestamp)` coroutines from add_handler(), each
+in its own task so a slow consumer never holds up the sensors. Periodic jobs
+such as writing metrics run on the same loop (every()).
+
+Needs edge events (use_edge_events=True) and lines with event_get_fd():
+libgpiod lines and fake_gpiod lines both have it.
+"""
+import asyncio
+import logging
+import threading
+
+from sensor_controller import SPEED_OF_SOUND, gpiod
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSensorRuntime:
+    def __init__(self, system, max_queued=256):
+        if not system.use_edge_events:
+            raise ValueError("The asyncio runtime needs a SensorSystem with use_edge_events=True")
+        self.system = system
+        self.max_queued = max_queued
+        self.queues = []
+        self.handlers = []
+        self.periodic = []  # (interval in seconds, function)
+        self.dropped = 0  # hits not delivered because a subscriber's queue was full
+        # A SimClock runs faster than the event loop's clock
+        self.time_scale = getattr(system.clock, "time_scale", 1.0)
+        self.loop = None
+        self.stopping = None
+        self.thread = None
+        self.started = threading.Event()
+        system.set_hit_callback(self.publish)
+
+    def subscribe(self):
+        """asyncio.Queue that receives every hit as (sensor_id, timestamp)"""
+        queue = asyncio.Queue(self.max_queued)
+        self.queues.append(queue)
+        return queue
+
+    def add_handler(self, handler):
+        """Await handler(sensor_id, timestamp) for every hit, in a task of its own"""
+        self.handlers.append(handler)
+
+    def every(self, interval, function):
+        """Call function() every interval seconds on the event loop"""
+        self.periodic.append((interval, function))
+
+    def publish(self, sensor_id, timestamp):
+        # Called by SensorSystem.process_reading, on the event loop
+        for queue in self.queues:
+            try:
+                queue.put_nowait((sensor_id, timestamp))
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    @staticmethod
+    def read_events(line, events):
+        """add_reader callback: move the line's pending edge events into its queue"""
+        while line.event_wait(sec=0, nsec=0):
+            events.put_nowait(line.event_read())
+
+    async def measure(self, sensor, events, timeout):
+        """One ping, timed from the kernel timestamps of the echo's edges; None without an echo"""
+        while not events.empty():
+            events.get_nowait()  # Left over from a ping that timed out
+        sensor.trigger()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout / self.time_scale
+        rising_ns = None
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                event = await asyncio.wait_for(events.get(), remaining)
+            except asyncio.TimeoutError:
+                return None
+            timestamp_ns = event.sec * 1_000_000_000 + event.nsec
+            if event.type == gpiod.LineEvent.RISING_EDGE:
+                rising_ns = timestamp_ns
+            elif rising_ns is not None:
+                return sensor.pulse_distance(rising_ns, timestamp_ns)
+
+    async def sensor_loop(self, sensor, events, slot):
+        loop = asyncio.get_running_loop()
+        system = self.system
+        while system.running:
+            async with slot:
+                slot_time = system.scheduler.slot_time  # read per slot so rate changes apply at once
+                slot_end = loop.time() + slot_time / self.time_scale
+                try:
+                    distance = await self.measure(sensor, events, slot_time)
+                    sensor.metrics.record_ping(None if distance is None else distance * 2 / SPEED_OF_SOUND)
+                    system.process_reading(sensor, distance)
+                except Exception as e:
+                    logger.error("Error in sensor %d monitoring: %s", sensor.sensor_id, e)
+                # Keep the slot until it ends, so the next ping cannot hear this echo
+                await asyncio.sleep(max(0.0, slot_end - loop.time()))
+
+    async def dispatch(self, handler, queue):
+        while True:
+            sensor_id, timestamp = await queue.get()
+            try:
+                await handler(sensor_id, timestamp)
+            except Exception as e:
+                logger.error("Hit handler %s failed: %s", handler.__name__, e)
+
+    async def repeat(self, interval, function):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                function()
+            except Exception as e:
+                logger.error("Periodic job %s failed: %s", function.__name__, e)
+
+    async def run(self):
+        """Monitor every sensor until stop() is called"""
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        system = self.system
+        system.running = True
+        slot = asyncio.Lock()
+        tasks = []
+        fds = []
+        for sensor in system.sensors:
+            events = asyncio.Queue()
+            fd = sensor.echo_line.event_get_fd()
+            self.loop.add_reader(fd, self.read_events, sensor.echo_line, events)
+            fds.append(fd)
+            tasks.append(asyncio.create_task(self.sensor_loop(sensor, events, slot)))
+        for handler in self.handlers:
+            tasks.append(asyncio.create_task(self.dispatch(handler, self.subscribe())))
+        for interval, function in self.periodic:
+            tasks.append(asyncio.create_task(self.repeat(interval, function)))
+        logger.info("Sensor event loop started: %d sensors, %.0f ms slots",
+                    len(system.sensors), system.scheduler.slot_time * 1000)
+        self.started.set()
+        try:
+            await self.stopping.wait()
+        finally:
+            system.running = False
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for fd in fds:
+                self.loop.remove_reader(fd)
+            logger.info("Sensor event loop stopped")
+
+    # For callers that are not async themselves, such as the pygame loop
+    def start(self):
+        """Run the event loop in a background thread"""
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(),), name="sensor-loop", daemon=True)
+        self.thread.start()
+        self.started.wait(timeout=5)
+
+    def stop(self):
+        """Stop the event loop, then save baselines and release the GPIO lines"""
+        if self.loop is not None and self.thread is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.stopping.set)
+            self.thread.join()
+        self.system.stop_monitoring()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
@@ -0,0 +1,84 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BaselineTracker:
+    """
+    Incremental estimate of a sensor's resting distance (its baseline).
+    This is a streaming median: every reading moves the estimate one small step
+    towards it, the step scaled by the running mean absolute deviation, so an
+    update is O(1) and the odd outlier barely moves it. Temperature drift is
+    followed slowly. Readings that stay outside the hit threshold for
+    relearn_after seconds mean the cup was moved, and the estimate jumps to
+    the new distance.
+    """
+
+    def __init__(self, baseline, spread=0.5, rate=0.02, relearn_after=10.0):
+        self.baseline = baseline
+        self.spread = spread  # mean absolute deviation of readings, in cm
+        self.rate = rate
+        self.relearn_after = relearn_after
+        self.shifted_since = None
+
+    def update(self, distance):
+        """Feed a reading taken while no ball is in view"""
+        deviation = distance - self.baseline
+        self.spread += self.rate * (abs(deviation) - self.spread)
+        step = self.rate * max(self.spread, 0.01)
+        self.baseline += step if deviation > 0 else -step
+        self.shifted_since = None
+
+    def shifted(self, distance, now):
+        """Report a reading outside the hit threshold; returns True if the baseline was relearned"""
+        if self.shifted_since is None:
+            self.shifted_since = now
+            return False
+        if now - self.shifted_since < self.relearn_after:
+            return False
+        self.baseline = distance
+        self.shifted_since = None
+        return True
+
+
+class BaselineStore:
+    """Baselines kept between runs in a JSON file, keyed by each sensor's pins"""
+
+    def __init__(self, path='sensor_baselines.json'):
+        self.path = path
+        self.baselines = {}
+        self.saved_at = 0
+        try:
+            with open(path) as f:
+                self.baselines = json.load(f)
+        except (OSError, ValueError):
+            pass  # First run, or an unreadable file: calibrate from scratch
+
+    @staticmethod
+    def key(sensor):
+        return f"{sensor.trigger_pin}/{sensor.echo_pin}"
+
+    def get(self, sensor):
+        """Stored {"baseline", "spread", "saved_at"} for a sensor, or None"""
+        return self.baselines.get(self.key(sensor))
+
+    def put(self, sensor, tracker):
+        self.baselines[self.key(sensor)] = {
+            "baseline": tracker.baseline,
+            "spread": tracker.spread,
+            "saved_at": time.time(),
+        }
+
+    def save(self):
+        # Write a temporary file and rename it, so a power cut never leaves half a file
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.baselines, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error("Failed to save sensor baselines: %s", e)
+        self.saved_at = time.time()
@@ -1,23 +1,50 @@
 import pygame
+import logging
+import os
 import sys
 import time
-import sqlite3
-from datetime import datetime
+from leaderboard import Leaderboard
+from score_store import ScoreStore
+from text_render import LeaderboardPanel, get_font, text_cache
+from renderer import DirtyRenderer
 from sensor_integration import start_sensor_system
+from hit_queue import HitQueue
+from logging_setup import setup_logging, shutdown_logging
+from frame_profiler import FrameProfiler
+from game_engine import GameEngine
+from cup_sprites import CupSprites
+from hit_input import HitInput
+from config import Config, ConfigError, ConfigWatcher, load_config
+from async_sensors import AsyncSensorRuntime
+from recorder import SensorRecorder
+from startup import Startup
 import threading
 
+logger = logging.getLogger(__name__)
+
 sensor_system = None
+# With edge events the sensors run on an asyncio loop; polled sensors use threads
+sensor_runtime = None
 sensor_monitor_thread = None
 is_running = True
-game_lock = threading.Lock()
-
-# Initialize Pygame
-pygame.init()
-
-# Set up the display to use full screen
-screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-width, height = screen.get_size()
-pygame.display.set_caption("Interactive Beer Pong")
+# Sensor hits are queued by the sensor thread and scored by the game loop
+hit_queue = HitQueue()
+# F3 toggles the sensor metrics overlay
+show_metrics = False
+# Sensor metrics are written here in Prometheus text format, if set
+metrics_file = os.environ.get("PYCUP_METRICS_FILE")
+# Every sensor reading and hit is appended to this recording, if set (see recorder.py)
+record_file = os.environ.get("PYCUP_RECORD")
+# Per-frame phase timings are dumped here as a Chrome trace on exit (and on F4), if set
+profile_file = os.environ.get("PYCUP_PROFILE")
+profiler = FrameProfiler(enabled=bool(profile_file))
+# Settings file (TOML or JSON, see config.py); thresholds, rates and timings are picked up live
+config_file = os.environ.get("PYCUP_CONFIG", "pycup.toml")
+config = Config()
+config_watcher = None
+renderer = None
+# Sensor bring-up and image loading run here while the start screen is already up
+startup = None
 
 # Colors
 WHITE = (255, 255, 255)
@@ -27,328 +54,450 @@ BLUE = (0, 0, 255)
 GREEN = (0, 255, 0)
 BLACK = (0, 0, 0)
 
-# Cup data structure
-cups = [{"pos": (0, 0), "color": WHITE, "radius": 0, "hit_time": 0, "hits": 0, "cooldown": 0} for _ in range(10)]
-
-# Game variables
-player_name = ""
-score = 0
-game_state = "start_screen"  # Changed initial state to start_screen
-start_time = 0
-game_duration = 10  # seconds
-
-# Button rectangles
-start_button_rect = pygame.Rect(width // 2 - 100, height * 3 // 4, 200, 50)
-name_submit_rect = pygame.Rect(width // 2 - 100, height * 2 // 3, 200, 50)
-continue_button_rect = pygame.Rect(width // 2 - 100, height * 2 // 3, 200, 50)
-
-# Database setup
-def setup_database():
-    conn = sqlite3.connect('beer_pong_scores.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS high_scores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            player_name TEXT NOT NULL,
-            score INTEGER NOT NULL,
-            date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
+CUP_COLORS = {"idle": WHITE, "first_hit": GREEN, "second_hit": BLUE, "cooldown": RED}
+HIT_MESSAGES = {1: "First hit! +1 point", 3: "Second hit! +3 points", 5: "Third hit! +5 points"}
+
+# Game state and rules, and the cup layout (engine.rack); this module only draws it and feeds it input
+engine = GameEngine(game_duration=10, now=time.time())
+
+# Digit keys hit cups; F5 toggles a synthetic stream of this many hits per second
+hit_input = HitInput(engine.num_cups)
+hit_rate = float(os.environ.get("PYCUP_HIT_RATE", "10"))
+
+# Display, buttons and database are set up by init_game(), so importing is free
+screen = None
+width = height = 0
+start_button_rect = name_submit_rect = continue_button_rect = None
+score_store = None
+leaderboard = None
+leaderboard_panel = None
+cup_sprites = None
+
+def init_game():
+    """Open the fullscreen window and the score database"""
+    global screen, width, height, start_button_rect, name_submit_rect, continue_button_rect
+    global score_store, leaderboard, leaderboard_panel, cup_sprites
+    pygame.init()
+    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    width, height = screen.get_size()
+    pygame.display.set_caption("Interactive Beer Pong")
+
+    start_button_rect = pygame.Rect(width // 2 - 100, height * 3 // 4, 200, 50)
+    name_submit_rect = pygame.Rect(width // 2 - 100, height * 2 // 3, 200, 50)
+    continue_button_rect = pygame.Rect(width // 2 - 100, height * 2 // 3, 200, 50)
+
+    # Database: one persistent connection, scores written by a background thread
+    score_store = ScoreStore('beer_pong_scores.db')
+    leaderboard = Leaderboard(get_high_scores)
+    leaderboard_panel = LeaderboardPanel(leaderboard, BLACK)
+    cup_sprites = CupSprites(draw_cup, CUP_COLORS)
+    engine.set_game_over_callback(save_score)
 
 def save_score(player_name, score):
-    conn = sqlite3.connect('beer_pong_scores.db')
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO high_scores (player_name, score) VALUES (?, ?)', (player_name, score))
-    conn.commit()
-    conn.close()
+    score_store.save(player_name, score)
+    leaderboard.add(player_name, score)
+    profiler.mark("score saved", score=score)
 
 def get_high_scores(limit=10):
-    conn = sqlite3.connect('beer_pong_scores.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT player_name, score, date_time FROM high_scores ORDER BY score DESC LIMIT ?', (limit,))
-    scores = cursor.fetchall()
-    conn.close()
-    return scores
+    return score_store.top(limit, '')
 
-# Initialize database
-setup_database()
+def report_sensor_status():
+    """Log that the sensors are alive and write their metrics; runs every 5 seconds"""
+    logger.debug("Sensor system active at %d", int(time.time()))
+    if metrics_file:
+        try:
+            sensor_system.metrics.write_prometheus(metrics_file)
+        except OSError as e:
+            logger.error("Failed to write metrics: %s", e)
 
 def monitor_sensors():
-    """Dedicated thread for monitoring sensor status"""
+    """Dedicated thread for monitoring sensor status (polled sensors only)"""
     global is_running
-    print("Sensor monitoring thread started")
+    reported_at = 0
+    logger.info("Sensor monitoring thread started")
     while is_running:
         if sensor_system and sensor_system.is_running():
             # Print status every 5 seconds
             current_time = int(time.time())
-            if current_time % 5 == 0:
-                print(f"Sensor system active at {current_time}")
+            if current_time % 5 == 0 and current_time != reported_at:
+                reported_at = current_time
+                report_sensor_status()
         time.sleep(0.1)
-    print("Sensor monitoring thread stopped")
+    logger.info("Sensor monitoring thread stopped")
 
-def sensor_hit_cup(cup_number):
+async def queue_sensor_hit(cup_number, timestamp):
+    """Hit handler on the sensor event loop; the game loop scores the hit"""
+    hit_queue.push(cup_number, timestamp)
+
+def sensor_hit_cup(cup_number, timestamp=None):
     """Wrapper function to handle sensor triggers"""
-    global game_state
-    with game_lock:
-        print(f"Sensor triggered cup {cup_number}")
-        if game_state == "playing":
-            print(f"Calling hit_cup({cup_number})")
-            hit_cup(cup_number)
-        else:
-            print(f"Game not in playing state (current state: {game_state})")
+    logger.info("Sensor triggered cup %d", cup_number)
+    if engine.state == "playing":
+        logger.debug("Calling hit_cup(%d)", cup_number)
+        hit_cup(cup_number, timestamp)
+    else:
+        logger.info("Game not in playing state (current state: %s)", engine.state)
+
+def process_sensor_hits():
+    """Score the hits the sensor thread queued since the last frame"""
+    for cup_number, timestamp in hit_queue.drain():
+        profiler.mark("sensor hit", cup=cup_number)
+        sensor_hit_cup(cup_number, timestamp)
+        if sensor_system:
+            sensor_system.metrics.score_latency.observe(time.time() - timestamp)
 
 def sensor_triggered(cup_number):
     hit_cup(cup_number)
-    print("Cup")
-    print(cup_number)
+    logger.info("Cup %d", cup_number)
 
-def initialize_sensors():
-    """Initialize the sensor system when the game starts"""
-    global sensor_system, sensor_monitor_thread
+def start_recording():
+    """Record what the sensors see to record_file, to settle disputed scores later"""
+    if not record_file:
+        return
+    try:
+        sensor_system.set_recorder(SensorRecorder(record_file, time.time()))
+    except (OSError, ValueError) as e:
+        logger.error("Not recording the sensors: %s", e)
+
+def initialize_sensors(progress=None):
+    """Initialize the sensor system when the game starts; progress(step) follows the bring-up"""
+    global sensor_system, sensor_runtime, sensor_monitor_thread
     try:
-        sensor_system = start_sensor_system()
-        sensor_system.set_hit_callback(lambda cup_number: hit_cup(cup_number))
-        print("Sensor system initialized successfully")
+        if config.sensors.use_edge_events:
+            # Every sensor is a coroutine waiting on its echo line; no threads to poll them
+            sensor_system = start_sensor_system(config=config, monitor=False, progress=progress)
+            start_recording()
+            sensor_runtime = AsyncSensorRuntime(sensor_system)
+            sensor_runtime.add_handler(queue_sensor_hit)
+            sensor_runtime.every(5, report_sensor_status)
+            sensor_runtime.start()
+            logger.info("Sensor system initialized successfully")
+            return
+
+        sensor_system = start_sensor_system(config=config, progress=progress)
+        start_recording()
+        sensor_system.set_hit_callback(hit_queue.push)
+        logger.info("Sensor system initialized successfully")
         
         # Start the monitoring thread
         sensor_monitor_thread = threading.Thread(target=monitor_sensors, daemon=True)
         sensor_monitor_thread.start()
-        print("Sensor monitoring thread started")
+        logger.info("Sensor monitoring thread started")
         
     except Exception as e:
-        print(f"Failed to initialize sensors: {e}")
+        logger.error("Failed to initialize sensors: %s", e)
         sensor_system = None
+        sensor_runtime = None
+        raise  # So the start-up task shows as failed
 
 def cleanup_sensors():
     """Clean up the sensor system when the game exits"""
-    global sensor_system, is_running
+    global sensor_system, sensor_runtime, is_running
     is_running = False
-    if sensor_system:
+    if startup:
+        startup.shutdown()  # Let a sensor bring-up in progress finish, so it can be stopped
+    if sensor_runtime:
+        sensor_runtime.stop()
+        logger.info("Sensor system stopped")
+    elif sensor_system:
         sensor_system.stop_monitoring()
-        print("Sensor system stopped")
+        logger.info("Sensor system stopped")
+    sensor_system = sensor_runtime = None
+
+def load_settings():
+    """Read config_file, if there is one, and watch it for changes"""
+    global config, config_watcher
+    if os.path.exists(config_file):
+        try:
+            config = load_config(config_file)
+            logger.info("Settings loaded from %s", config_file)
+        except (OSError, ConfigError) as e:
+            logger.error("Using default settings: %s", e)
+        config_watcher = ConfigWatcher(config_file, apply_settings)
+        config_watcher.start()
+    apply_settings(config)
+
+def apply_settings(new_config):
+    """Apply the settings that can change while the game runs (called from the watcher thread)"""
+    global config
+    config = new_config
+    engine.game_duration = config.game.game_duration
+    engine.countdown = config.game.countdown
+    if renderer:
+        renderer.fps = config.display.fps
+        renderer.idle_fps = config.display.idle_fps
+        renderer.idle_after = config.display.idle_after
+    if sensor_system:
+        sensor_system.apply_config(config)
 
 def draw_cup(surface, x, y, radius, inner_color):
-    pygame.draw.circle(surface, RED, (x, y), radius)
+    rect = pygame.draw.circle(surface, RED, (x, y), radius)
     pygame.draw.circle(surface, inner_color, (x, y), radius - 4)
     pygame.draw.circle(surface, DARK_RED, (x, y), radius, 2)
     pygame.draw.circle(surface, DARK_RED, (x, y), radius - 8, 1)
+    return rect
 
-def setup_cup_formation(start_x, start_y, cup_radius, spacing):
-    cup_index = 0
-    rows = 4
-    for row in range(rows):
-        for col in range(rows - row):
-            x = start_x + col * (cup_radius * 2 + spacing) - (rows - row - 1) * (cup_radius + spacing / 2)
-            y = start_y + row * (cup_radius * 2 + spacing) * 0.866
-            cups[cup_index]["pos"] = (int(x), int(y))
-            cups[cup_index]["radius"] = cup_radius
-            cup_index += 1
+def setup_cup_formation(start_x, start_y, radius, spacing):
+    engine.rack.arrange_triangle(start_x, start_y, radius, spacing)
+
+def cup_states():
+    """Current state of every cup, a key of CUP_COLORS"""
+    return [engine.cup_state(i) for i in range(engine.num_cups)]
+
+def cup_sprite(i, states):
+    """(sprite, position) of cup i, for Surface.blits"""
+    rack = engine.rack
+    return cup_sprites.blit_args(states[i], rack.xs[i], rack.ys[i], rack.radii[i])
 
 def draw_cup_formation(surface):
-    current_time = time.time()
-    for cup in cups:
-        if current_time - cup["cooldown"] < 1:
-            inner_color = RED
-        elif cup["hits"] == 2 and current_time - cup["hit_time"] < 2:
-            inner_color = BLUE
-        elif cup["hits"] == 1 and current_time - cup["hit_time"] < 3:
-            inner_color = GREEN
-        else:
-            cup["color"] = WHITE
-            cup["hits"] = 0
-            inner_color = WHITE
-        draw_cup(surface, cup["pos"][0], cup["pos"][1], cup["radius"], inner_color)
+    states = cup_states()
+    rects = surface.blits([cup_sprite(i, states) for i in range(engine.num_cups)])
+    return rects[0].unionall(rects[1:])
 
 def draw_text(surface, text, font, color, x, y, center=True):
-    text_surface = font.render(text, True, color)
+    text_surface = text_cache.render(font, text, color)
     text_rect = text_surface.get_rect()
     if center:
         text_rect.center = (x, y)
     else:
         text_rect.topleft = (x, y)
-    surface.blit(text_surface, text_rect)
+    return surface.blit(text_surface, text_rect)
 
 def draw_high_scores(surface):
-    font = pygame.font.Font(None, 36)
-    draw_text(surface, "High Scores", font, BLACK, width * 5 // 6, height // 6)
-
-    high_scores = get_high_scores()
-    for i, (name, score, date) in enumerate(high_scores):
-        date_obj = datetime.strptime(date, '%Y-%m-%d %H:%M:%S')
-        date_str = date_obj.strftime('%m/%d/%Y')
-        score_text = f"{name}: {score} ({date_str})"
-        draw_text(surface, score_text, font, BLACK, width * 5 // 6, height // 6 + (i + 1) * 40)
+    return leaderboard_panel.draw(surface, width * 5 // 6, height // 6)
+
+def draw_metrics_overlay(surface):
+    """Sensor metrics in the bottom left corner"""
+    font = get_font(24)
+    lines = sensor_system.metrics.overlay_lines()
+    y = height - 10 - len(lines) * 22
+    rects = [draw_text(surface, line, font, BLACK, 10, y + i * 22, False) for i, line in enumerate(lines)]
+    return rects[0].unionall(rects[1:])
+
+# Static layers of each screen, drawn once when the screen is entered
+def clear_screen(surface):
+    surface.fill(WHITE)
+
+def draw_start_screen(surface, background_image):
+    surface.fill(WHITE)
+    if background_image is not None:  # None while it is still loading
+        image_rect = background_image.get_rect()
+        background_x = (surface.get_width() - image_rect.width) // 2
+        background_y = (surface.get_height() - image_rect.height) // 2
+        surface.blit(background_image, (background_x, background_y))
+    draw_text(surface, "Beer Pong", get_font(256), BLACK, width // 2, 450)
+    pygame.draw.rect(surface, RED, start_button_rect)
+    draw_text(surface, "Start Game", get_font(36), WHITE, start_button_rect.centerx, start_button_rect.centery)
+
+def draw_startup_progress(surface, lines):
+    """What is still starting up, in the bottom right corner (the metrics overlay is bottom left)"""
+    if not lines:
+        return None
+    font = get_font(36)
+    y = height - 40 * len(lines) - 10
+    rects = []
+    for i, line in enumerate(lines):
+        text_surface = text_cache.render(font, line, BLACK)
+        rects.append(surface.blit(text_surface, text_surface.get_rect(topright=(width - 10, y + 40 * i))))
+    return rects[0].unionall(rects[1:])
+
+def load_background_image():
+    """Decode and scale the start screen image (on a start-up worker)"""
+    image = pygame.image.load("images/ArrowTechHubTransparentLightMode.png")
+    return pygame.transform.scale(image, (1200, 1200))
+
+def draw_input_name_screen(surface):
+    surface.fill(WHITE)
+    draw_text(surface, "Enter Your Name", get_font(128), BLACK, width // 2, height // 3)
+    # Draw name input box
+    input_box_rect = pygame.Rect(width // 2 - 200, height // 2 - 25, 400, 50)
+    pygame.draw.rect(surface, BLACK, input_box_rect, 2)
+    # Draw start button
+    pygame.draw.rect(surface, RED, name_submit_rect)
+    draw_text(surface, "Start Game", get_font(36), WHITE, name_submit_rect.centerx, name_submit_rect.centery)
+
+def draw_game_over_screen(surface):
+    surface.fill(WHITE)
+    draw_text(surface, "Game Over", get_font(256), BLACK, width // 2, height // 2 - 50)
+    draw_text(surface, f"Your score: {engine.score}", get_font(36), BLACK, width // 2, height // 2 + 50)
+    # Draw continue button
+    pygame.draw.rect(surface, RED, continue_button_rect)
+    draw_text(surface, "Continue", get_font(36), WHITE, continue_button_rect.centerx, continue_button_rect.centery)
 
 def handle_events():
-    global player_name, game_state, score, start_time
+    global show_metrics
     for event in pygame.event.get():
         if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
             return False
-        elif game_state == "start_screen":
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            show_metrics = not show_metrics
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+            profiler.dump(profile_file)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+            hit_input.toggle_stream(hit_rate, time.time())
+        elif engine.state == "start_screen":
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if start_button_rect.collidepoint(event.pos):
-                    game_state = "input_name"
-                    player_name = ""  # Reset player name when entering name input screen
-        elif game_state == "input_name":
+                    engine.show_name_entry()
+        elif engine.state == "input_name":
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_BACKSPACE:
-                    player_name = player_name[:-1]
+                    engine.player_name = engine.player_name[:-1]
                 elif event.key != pygame.K_RETURN:  # Allow typing except Enter key
-                    player_name += event.unicode
+                    engine.player_name += event.unicode
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                if name_submit_rect.collidepoint(event.pos) and player_name.strip():
-                    game_state = "countdown"
-                    start_time = time.time()
-        elif game_state == "playing":
-            if event.type == pygame.MOUSEBUTTONDOWN:
+                if name_submit_rect.collidepoint(event.pos):
+                    engine.start_countdown()
+        elif engine.state == "playing":
+            if event.type == pygame.KEYDOWN:
+                hit_input.key_down(event.key, time.time())
+            # Touches also arrive as mouse clicks; take each finger once, from its own event
+            elif event.type == pygame.MOUSEBUTTONDOWN and not getattr(event, "touch", False):
                 handle_cup_click(event.pos)
-        elif game_state == "game_over":
+            elif event.type == pygame.FINGERDOWN:
+                handle_cup_click((int(event.x * width), int(event.y * height)))
+        elif engine.state == "game_over":
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if continue_button_rect.collidepoint(event.pos):
-                    game_state = "start_screen"
+                    engine.return_to_start()
     return True
 
-def hit_cup(cup_number):
-    """Hit a specific cup by its number (0-9)"""
-    global score
-    if not 0 <= cup_number < len(cups):
-        print(f"Invalid cup number: {cup_number}")
+def hit_cup(cup_number, timestamp=None):
+    """
+    Hit a specific cup by its number (0-9).
+    timestamp is when the hit happened (defaults to now); combo windows are
+    measured between hit timestamps, not between the times hits are processed.
+    """
+    if not 0 <= cup_number < engine.num_cups:
+        logger.warning("Invalid cup number: %d", cup_number)
         return
 
-    cup = cups[cup_number]
-    current_time = time.time()
-    print(f"Processing hit on cup {cup_number}")
-
-    if current_time - cup["cooldown"] >= 1:  # Check if cup is not in cooldown
-        if cup["hits"] == 2 and current_time - cup["hit_time"] < 2:
-            score += 5
-            cup["cooldown"] = current_time
-            print(f"Cup {cup_number}: Third hit! +5 points")
-        elif cup["hits"] == 1 and current_time - cup["hit_time"] < 3:
-            cup["hits"] = 2
-            score += 3
-            print(f"Cup {cup_number}: Second hit! +3 points")
-        else:
-            cup["hits"] = 1
-            score += 1
-            print(f"Cup {cup_number}: First hit! +1 point")
-        cup["hit_time"] = current_time
+    logger.debug("Processing hit on cup %d", cup_number)
+    points = engine.hit(cup_number, time.time() if timestamp is None else timestamp)
+    if points:
+        logger.info("Cup %d: %s", cup_number, HIT_MESSAGES[points])
     else:
-        print(f"Cup {cup_number} is in cooldown")
+        logger.debug("Cup %d is in cooldown", cup_number)
 
 def handle_cup_click(pos):
-    """
-    Modified to handle mouse clicks by finding the closest cup and calling hit_cup()
-    """
-    for i, cup in enumerate(cups):
-        if pygame.math.Vector2(cup["pos"]).distance_to(pos) < cup["radius"]:
-            hit_cup(i)
-            break
+    """Hit the cup under a click or touch, if any"""
+    cup_number = engine.rack.cup_at(*pos)
+    if cup_number >= 0:
+        hit_cup(cup_number)
 
 def main():
-    global game_state, start_time, score, sensor_system, is_running
-
-    initialize_sensors()
+    global renderer, startup
+    # Log through a background writer so console output never stalls a frame
+    setup_logging()
+    load_settings()
+    init_game()
+    # The start screen comes up right away; sensors and images follow in the background
+    startup = Startup()
+    startup.add("Sensors", initialize_sensors, lambda step: startup.report("Sensors", step))
+    startup.add("Images", load_background_image)
 
     clock = pygame.time.Clock()
 
     # Calculate cup size and spacing based on screen size
-    cup_radius = min(width, height) // 25
-    spacing = cup_radius // 2
+    radius = min(width, height) // 25
+    spacing = radius // 2
 
     # Calculate starting position to center the formation in the left 2/3 of the screen
     start_x = width // 3
-    start_y = height // 2 - (3 * (cup_radius * 2 + spacing) * 0.866) // 2
+    start_y = height // 2 - (3 * (radius * 2 + spacing) * 0.866) // 2
 
     # Set up the initial cup formation
-    setup_cup_formation(start_x, start_y, cup_radius, spacing)
+    setup_cup_formation(start_x, start_y, radius, spacing)
 
     # Fonts
-    font = pygame.font.Font(None, 36)
-    medium_font = pygame.font.Font(None, 128)
-    large_font = pygame.font.Font(None, 256)
+    font = get_font(36)
+    medium_font = get_font(128)
+    large_font = get_font(256)
+
+    # Images, once the start-up worker has loaded them
+    background_image = None
+    images_loaded = False
 
-    # Images
-    background_image = pygame.image.load("images/ArrowTechHubTransparentLightMode.png")
-    background_image = pygame.transform.scale(background_image, (1200, 1200))
-    image_rect = background_image.get_rect()
+    # Only redraws what changed, and idles when nothing does
+    renderer = DirtyRenderer(screen, config.display.fps, config.display.idle_fps, config.display.idle_after)
+    metrics_shown = False
 
     running = True
     while running:
+        profiler.begin_frame()
+        profiler.phase("events")
         running = handle_events()
-        screen.fill(WHITE)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        # Example of how to use hit_cup() with keyboard numbers (for testing)
-        keys = pygame.key.get_pressed()
-        if game_state == "playing":
-            for i in range(10):  # 0-9 keys
-                if keys[pygame.K_0 + i]:
-                    hit_cup(i)
-
-        if game_state == "start_screen":
-            # Draw start screen
-            background_x = (screen.get_width() - image_rect.width) // 2
-            background_y = (screen.get_height() - image_rect.height) // 2
-            screen.blit(background_image, (background_x, background_y))
-            draw_text(screen, "Beer Pong", large_font, BLACK, width // 2, 450)
-            pygame.draw.rect(screen, RED, start_button_rect)
-            draw_text(screen, "Start Game", font, WHITE, start_button_rect.centerx, start_button_rect.centery)
-            draw_high_scores(screen)
-
-        elif game_state == "input_name":
-            # Draw name input screen
-            draw_text(screen, "Enter Your Name", medium_font, BLACK, width // 2, height // 3)
-            # Draw name input box
-            input_box_rect = pygame.Rect(width // 2 - 200, height // 2 - 25, 400, 50)
-            pygame.draw.rect(screen, BLACK, input_box_rect, 2)
-            draw_text(screen, player_name, font, BLACK, width // 2, height // 2)
-            # Draw start button
-            pygame.draw.rect(screen, RED, name_submit_rect)
-            draw_text(screen, "Start Game", font, WHITE, name_submit_rect.centerx, name_submit_rect.centery)
-            draw_high_scores(screen)
-
-        elif game_state == "countdown":
-            countdown = 3 - int(time.time() - start_time)
-            if countdown > 0:
-                draw_text(screen, str(countdown), large_font, BLACK, width // 2, height // 2)
-            else:
-                game_state = "playing"
-                start_time = time.time()
-                score = 0
-
-        elif game_state == "playing":
-            draw_cup_formation(screen)
-            elapsed_time = int(time.time() - start_time)
-            remaining_time = max(0, game_duration - elapsed_time)
-            draw_text(screen, f"Player: {player_name} - Points {score}", font, BLACK, 10, 10, False)
-            draw_text(screen, f"Time: {remaining_time}", medium_font, BLACK, 10, 100, False)
-            draw_high_scores(screen)
-
-            if remaining_time == 0:
-                game_state = "game_over"
-                save_score(player_name, score)
-
-        elif game_state == "game_over":
-            draw_text(screen, "Game Over", large_font, BLACK, width // 2, height // 2 - 50)
-            draw_text(screen, f"Your score: {score}", font, BLACK, width // 2, height // 2 + 50)
-            # Draw continue button
-            pygame.draw.rect(screen, RED, continue_button_rect)
-            draw_text(screen, "Continue", font, WHITE, continue_button_rect.centerx, continue_button_rect.centery)
-            draw_high_scores(screen)
+        profiler.phase("update")
+        engine.tick(time.time() - engine.now)
+        if not images_loaded and startup.done("Images"):
+            images_loaded = True
+            background_image = startup.result("Images")
+            if background_image is not None:
+                # Converting needs the display, so it happens here rather than on the worker
+                background_image = background_image.convert_alpha()
+                renderer.invalidate()
+
+        profiler.phase("sensor_hits")
+        process_sensor_hits()
+
+        profiler.phase("keyboard")
+        # Hits from digit keys and synthetic streams, each at the time it was made
+        hit_input.poll(time.time(), hit_cup if engine.state == "playing" else None)
+
+        profiler.phase("render")
+        if engine.state == "start_screen":
+            renderer.set_scene("start_screen", lambda surface: draw_start_screen(surface, background_image))
+            renderer.region("high_scores", leaderboard.version, draw_high_scores)
+            startup_lines = startup.status_lines()
+            renderer.region("startup", startup_lines, draw_startup_progress, startup_lines)
+
+        elif engine.state == "input_name":
+            renderer.set_scene("input_name", draw_input_name_screen)
+            renderer.region("player_name", engine.player_name, draw_text, engine.player_name, font, BLACK, width // 2, height // 2)
+            renderer.region("high_scores", leaderboard.version, draw_high_scores)
+
+        elif engine.state == "countdown":
+            countdown = engine.countdown_remaining()
+            renderer.set_scene("countdown", clear_screen)
+            renderer.region("countdown", countdown, draw_text, str(countdown), large_font, BLACK, width // 2, height // 2)
+
+        elif engine.state == "playing":
+            renderer.set_scene("playing", clear_screen)
+            states = cup_states()
+            renderer.sprites("cups", states, lambda i: cup_sprite(i, states))
+            remaining_time = engine.remaining_time()
+            score_text = f"Player: {engine.player_name} - Points {engine.score}"
+            renderer.region("score", engine.score, draw_text, score_text, font, BLACK, 10, 10, False)
+            renderer.region("timer", remaining_time, draw_text, f"Time: {remaining_time}", medium_font, BLACK, 10, 100, False)
+            renderer.region("high_scores", leaderboard.version, draw_high_scores)
+
+        elif engine.state == "game_over":
+            renderer.set_scene("game_over", draw_game_over_screen)
+            renderer.region("high_scores", leaderboard.version, draw_high_scores)
+        if show_metrics != metrics_shown:
+            metrics_shown = show_metrics
+            renderer.invalidate()  # Redraw the screen under the overlay
+        elif show_metrics and sensor_system:
+            renderer.region("metrics", int(time.time()), draw_metrics_overlay)
+
+        profiler.phase("sleep")
         time.sleep(0.001)
-        pygame.display.flip()
-        clock.tick(60)
+        profiler.phase("present")
+        renderer.present()
+        profiler.phase("tick")
+        clock.tick(renderer.frame_rate(engine.state in ("input_name", "countdown", "playing")))
+        profiler.end_frame()
 
         if not running:
             # Clean up sensors before exiting
             cleanup_sensors()
 
+    score_store.close()
     pygame.quit()
     sys.exit()
 
@@ -593,9 +742,13 @@ if __name__ == "__main__":
     try:
         main()
     except Exception as e:
-        print(f"Error in main: {e}")
+        logger.exception("Error in main: %s", e)
         cleanup_sensors()
     finally:
         cleanup_sensors()
+        profiler.dump(profile_file)
+        if score_store:
+            score_store.close()
+        shutdown_logging()
         pygame.quit()
         sys.exit()
\ No newline at end of file
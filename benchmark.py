@@ -0,0 +1,300 @@
+"""Benchmarks for the detection and scoring pipeline and the per-frame drawing.
+
+Runs without hardware or a display: the sensors use the simulated gpiod backend
+and pygame uses SDL's dummy video driver. Results are compared with the stored
+baseline, and the script exits with status 1 if anything got slower by more
+than the tolerance. Create the baseline on the machine you compare against
+(e.g. the Pi itself):
+
+    python benchmark.py --save-baseline   # store this run as the baseline
+    python benchmark.py                   # run and compare with the baseline
+    python benchmark.py --recording game.rec   # also replay a recorded game (recorder.py)
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(REPO_DIR, "benchmark_baseline.json")
+
+# Pin map of the full 10-cup rack
+BENCH_PINS = [
+    {"trigger": 23, "echo": 24}, {"trigger": 17, "echo": 27}, {"trigger": 22, "echo": 10},
+    {"trigger": 9, "echo": 11}, {"trigger": 5, "echo": 6}, {"trigger": 13, "echo": 19},
+    {"trigger": 26, "echo": 21}, {"trigger": 20, "echo": 16}, {"trigger": 12, "echo": 7},
+    {"trigger": 8, "echo": 25},
+]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def result(value, unit, higher_is_better):
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def best_rate(step, count, repeats=3, setup=None):
+    """
+    Calls per second of step(i), best of a few runs to keep out scheduler noise.
+    setup() runs untimed before each run, for steps that change state.
+    """
+    best = 0.0
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for i in range(count):
+            step(i)
+        best = max(best, count / (time.perf_counter() - start))
+    return best
+
+
+def make_sensor_system(backend, workdir):
+    from sensor_controller import SensorSystem
+    system = SensorSystem(backend=backend, baseline_file=os.path.join(workdir, "baselines.json"))
+    system.sensor_pins = BENCH_PINS
+    system.setup_sensors()
+    for sensor in system.sensors:
+        sensor.apply_calibration([backend.baseline])
+    return system
+
+
+def bench_measure_distance(workdir, pings=2000):
+    """Pings per second through UltrasonicSensor.measure_distance (edge-event mode)"""
+    from gpio_backend import SimulatedBackend
+    # Run simulated time 1000x faster so this measures our overhead, not the speed of sound
+    system = make_sensor_system(SimulatedBackend(time_scale=1000), workdir)
+    sensors = system.sensors
+    rate = best_rate(lambda i: sensors[i % len(sensors)].measure_distance(), pings)
+    return {"measure_distance_pings_per_s": result(rate, "pings/s", True)}
+
+
+def bench_check_sensor(workdir, checks=2000):
+    """Readings per second through SensorSystem.check_sensor, the detection step of every ping"""
+    from gpio_backend import SimulatedBackend
+    system = make_sensor_system(SimulatedBackend(noise=0.2, time_scale=1000, seed=1), workdir)
+    system.set_hit_callback(lambda sensor_id, timestamp: None)
+    sensors = system.sensors
+    rate = best_rate(lambda i: system.check_sensor(sensors[i % len(sensors)]), checks)
+    return {"check_sensor_per_s": result(rate, "readings/s", True)}
+
+
+def bench_detection_latency(workdir, drops=40, time_scale=10):
+    """Ball drop to hit callback, through the scheduler, in simulated time"""
+    from gpio_backend import SimulatedBackend
+    backend = SimulatedBackend(noise=0.2, time_scale=time_scale, seed=2)
+    system = make_sensor_system(backend, workdir)
+    clock = backend.clock
+    rng = random.Random(3)
+    dropped_at = {}
+    latencies = []
+    extra_hits = []
+
+    def on_hit(sensor_id, timestamp):
+        if sensor_id in dropped_at:
+            latencies.append(clock.elapsed() - dropped_at.pop(sensor_id))
+        else:
+            extra_hits.append(sensor_id)  # A drop scored twice, or a hit without a ball
+
+    system.set_hit_callback(on_hit)
+    system.start_monitoring()
+    try:
+        for i in range(drops):
+            sensor_id = i % len(system.sensors)
+            # Space drops so every sensor is out of its debounce window again
+            clock.sleep(0.5 + rng.random() * 0.2)
+            dropped_at[sensor_id] = clock.elapsed()
+            backend.drop_ball(BENCH_PINS[sensor_id]["trigger"], duration=1.0)
+        clock.sleep(2.0)
+    finally:
+        system.stop_monitoring()
+    if not latencies:
+        return {}
+    return {
+        "detection_latency_p50_ms": result(percentile(latencies, 0.50) * 1000, "ms", False),
+        "detection_latency_p95_ms": result(percentile(latencies, 0.95) * 1000, "ms", False),
+        "detection_latency_p99_ms": result(percentile(latencies, 0.99) * 1000, "ms", False),
+        "detection_missed": result(drops - len(latencies), "drops", False),
+        "detection_extra_hits": result(len(extra_hits), "hits", False),
+    }
+
+
+def bench_replay(path):
+    """Recorded readings per second through the detection logic and GameEngine.hit"""
+    from game_engine import GameEngine
+    from recorder import load_recording, replay_recording
+    recording = load_recording(path)
+    best = 0.0
+    for _ in range(3):
+        engine = GameEngine(num_cups=max(10, recording.sensor_count()))
+        start = time.perf_counter()
+        samples = replay_recording(recording, engine.hit).samples
+        best = max(best, samples / (time.perf_counter() - start))
+    return {"replay_samples_per_s": result(best, "readings/s", True)}
+
+
+def bench_hit_cup(game, hits=20000):
+    start = time.time()
+    engine = game.engine
+
+    def new_game():
+        # Every run replays the same timestamps, so it needs cups that have not seen them yet
+        engine.reset_cups()
+        engine.now = start
+
+    # Hits 50ms apart, cycling through the cups, so every scoring branch is taken
+    rate = best_rate(lambda i: game.hit_cup(i % engine.num_cups, start + i * 0.05), hits, setup=new_game)
+    return {"hit_cup_per_s": result(rate, "hits/s", True)}
+
+
+def bench_cup_click(game, clicks=20000):
+    """Clicks per second through handle_cup_click, half of them on a cup"""
+    rack = game.engine.rack
+    rng = random.Random(5)
+    points = []
+    for i in range(256):
+        if i % 2:
+            x, y = rack.position(rng.randrange(len(rack)))
+            points.append((x + rng.randint(-5, 5), y + rng.randint(-5, 5)))
+        else:
+            points.append((rng.randrange(game.width), rng.randrange(game.height)))
+    rate = best_rate(lambda i: game.handle_cup_click(points[i % len(points)]), clicks)
+    return {"cup_click_per_s": result(rate, "clicks/s", True)}
+
+
+def bench_simulated_games(games=500, dt=0.1):
+    """Whole games on the headless GameEngine: a hit every tick on a random cup"""
+    from game_engine import GameEngine
+    rng = random.Random(4)
+
+    def play(i):
+        engine = GameEngine()
+        engine.show_name_entry()
+        engine.player_name = f"sim{i}"
+        engine.start_countdown()
+        while engine.state != "game_over":
+            engine.tick(dt)
+            if engine.state == "playing":
+                engine.hit(rng.randrange(engine.num_cups))
+
+    return {"simulated_games_per_s": result(best_rate(play, games), "games/s", True)}
+
+
+def bench_render(game, frames=600):
+    """Per-call time of the per-frame drawing functions on the dummy display"""
+    font = game.get_font(36)
+    medium_font = game.get_font(128)
+    samples = {"draw_cup_formation": [], "draw_high_scores": [], "draw_text": [], "frame": []}
+    for i in range(frames):
+        frame_start = time.perf_counter()
+        start = time.perf_counter()
+        game.draw_cup_formation(game.screen)
+        samples["draw_cup_formation"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        game.draw_text(game.screen, f"Player: bench - Points {i // 30}", font, game.BLACK, 10, 10, False)
+        game.draw_text(game.screen, f"Time: {i // 60}", medium_font, game.BLACK, 10, 100, False)
+        samples["draw_text"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        game.draw_high_scores(game.screen)
+        samples["draw_high_scores"].append(time.perf_counter() - start)
+        samples["frame"].append(time.perf_counter() - frame_start)
+
+    results = {}
+    for name, times in samples.items():
+        results[f"{name}_p50_us"] = result(percentile(times, 0.50) * 1e6, "us", False)
+        results[f"{name}_p99_us"] = result(percentile(times, 0.99) * 1e6, "us", False)
+    return results
+
+
+def load_game(workdir):
+    """Set the game up on the dummy display, with its database in workdir"""
+    os.chdir(workdir)
+    import beer_pong_game as game
+    game.init_game()
+    for i in range(12):
+        game.score_store.save(f"player{i}", i * 3)
+    game.score_store.flush()
+    game.leaderboard.load()
+    cup_radius = min(game.width, game.height) // 25
+    spacing = cup_radius // 2
+    start_y = game.height // 2 - (3 * (cup_radius * 2 + spacing) * 0.866) // 2
+    game.setup_cup_formation(game.width // 3, start_y, cup_radius, spacing)
+    return game
+
+
+def compare(results, baseline, tolerance):
+    """Print results next to the baseline; returns the names that regressed"""
+    regressions = []
+    print(f"{'benchmark':32} {'value':>12} {'baseline':>12} {'change':>8}")
+    for name, current in results.items():
+        line = f"{name:32} {current['value']:12.1f}"
+        reference = baseline.get(name)
+        if reference and reference["value"]:
+            change = (current["value"] - reference["value"]) / reference["value"]
+            worse = -change if current["higher_is_better"] else change
+            line += f" {reference['value']:12.1f} {change:+8.1%}"
+            if worse > tolerance:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(f"{line}  {current['unit']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, as a fraction")
+    parser.add_argument("--recording", help="sensor recording to replay as a benchmark (see recorder.py)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_DIR)
+    logging.disable(logging.WARNING)  # Benchmark the work, not the console
+    workdir = tempfile.mkdtemp(prefix="pycup-bench-")
+
+    results = {}
+    results.update(bench_measure_distance(workdir))
+    results.update(bench_check_sensor(workdir))
+    results.update(bench_detection_latency(workdir))
+    results.update(bench_simulated_games())
+    if args.recording:
+        results.update(bench_replay(os.path.abspath(args.recording)))
+    game = load_game(workdir)
+    results.update(bench_hit_cup(game))
+    results.update(bench_cup_click(game))
+    results.update(bench_render(game))
+    game.score_store.close()
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
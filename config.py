@@ -0,0 +1,189 @@
+"""Settings for pins, hit detection, ping scheduling, frame rates and game timing.
+
+Settings are read from a TOML or JSON file with one table per section.
+Anything left out keeps its default:
+
+    [sensors]
+    chip = "4"
+    pins = [{trigger = 23, echo = 24}, {trigger = 17, echo = 27}]
+    hit_threshold = 0.10
+
+    [scheduling]
+    slot_time = 0.03
+
+    [display]
+    fps = 60
+
+    [game]
+    game_duration = 10
+
+See pycup.example.toml for every setting. ConfigWatcher reloads the file when
+it changes. Hit threshold, debounce time, slot time, frame caps and game
+timing are applied to the running game. Pins, chip, edge events, filter and
+baseline file settings need a restart.
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field, fields
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    tomllib = None
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigError(ValueError):
+    pass
+
+
+@dataclass
+class SensorConfig:
+    chip: str = '4'
+    pins: list = None  # [{"trigger": pin, "echo": pin}, ...]; None for SENSOR_PINS
+    hit_threshold: float = 0.10  # a hit differs from the baseline by this fraction of it
+    debounce_time: float = 1.0  # seconds between two hits on one sensor
+    use_edge_events: bool = True
+    filter_method: str = "none"  # none, median, ema or hampel; a filter delays hits by one reading
+    filter_window: int = 3
+    baseline_file: str = 'sensor_baselines.json'
+
+    def __post_init__(self):
+        if self.pins is not None:
+            for pins in self.pins:
+                if (not isinstance(pins, dict) or set(pins) != {"trigger", "echo"}
+                        or not all(isinstance(pin, int) for pin in pins.values())):
+                    raise ConfigError(f"sensors.pins entries need integer trigger and echo pins, not {pins!r}")
+        if self.hit_threshold <= 0:
+            raise ConfigError("sensors.hit_threshold must be positive")
+        if self.filter_method not in ("median", "ema", "hampel", "none"):
+            raise ConfigError(f"Unknown sensors.filter_method {self.filter_method!r}")
+
+
+@dataclass
+class SchedulingConfig:
+    slot_time: float = 0.03  # seconds per ping, and its echo timeout; one sensor pings per slot
+
+    def __post_init__(self):
+        if self.slot_time <= 0:
+            raise ConfigError("scheduling.slot_time must be positive")
+
+
+@dataclass
+class DisplayConfig:
+    fps: int = 60  # frame cap while the screen changes
+    idle_fps: int = 10  # frame cap while nothing changes
+    idle_after: float = 0.5  # seconds without changes before going idle
+
+    def __post_init__(self):
+        if self.fps <= 0 or self.idle_fps <= 0:
+            raise ConfigError("display.fps and display.idle_fps must be positive")
+
+
+@dataclass
+class GameConfig:
+    game_duration: int = 10  # seconds
+    countdown: int = 3  # seconds
+
+
+@dataclass
+class Config:
+    sensors: SensorConfig = field(default_factory=SensorConfig)
+    scheduling: SchedulingConfig = field(default_factory=SchedulingConfig)
+    display: DisplayConfig = field(default_factory=DisplayConfig)
+    game: GameConfig = field(default_factory=GameConfig)
+
+
+def _section(cls, name, values):
+    """Build one section, checking every value against its field's type"""
+    if not isinstance(values, dict):
+        raise ConfigError(f"[{name}] must be a table")
+    known = {f.name: f.type for f in fields(cls)}
+    unknown = sorted(set(values) - set(known))
+    if unknown:
+        raise ConfigError(f"Unknown setting(s) in [{name}]: {', '.join(unknown)}")
+    checked = {}
+    for key, value in values.items():
+        expected = known[key]
+        if expected is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if not isinstance(value, expected) or (expected is not bool and isinstance(value, bool)):
+            raise ConfigError(f"{name}.{key} should be {expected.__name__}, not {type(value).__name__}")
+        checked[key] = value
+    return cls(**checked)
+
+
+def parse_config(data):
+    """Config from a dict of sections, as read from a file"""
+    sections = {f.name: f.default_factory for f in fields(Config)}
+    unknown = sorted(set(data) - set(sections))
+    if unknown:
+        raise ConfigError(f"Unknown section(s): {', '.join(unknown)}")
+    return Config(**{name: _section(sections[name], name, values) for name, values in data.items()})
+
+
+def load_config(path):
+    """Read a .toml or .json settings file; raises ConfigError (or OSError) if it is unusable"""
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ConfigError("TOML settings need Python 3.11 or newer; use a .json file")
+        try:
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            raise ConfigError(f"{path}: {e}") from e
+    else:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ConfigError(f"{path}: {e}") from e
+    return parse_config(data)
+
+
+class ConfigWatcher:
+    """
+    Polls a settings file and calls callback(config) from its own thread
+    whenever the file changes and still loads. A broken edit is logged and
+    the previous settings stay in effect.
+    """
+
+    def __init__(self, path, callback, interval=1.0):
+        self.path = path
+        self.callback = callback
+        self.interval = interval
+        self.mtime = self.stat()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="config-watcher", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            mtime = self.stat()
+            if mtime is None or mtime == self.mtime:
+                continue
+            self.mtime = mtime
+            try:
+                config = load_config(self.path)
+            except (OSError, ConfigError) as e:
+                logger.error("Keeping the previous settings: %s", e)
+                continue
+            logger.info("Reloaded settings from %s", self.path)
+            self.callback(config)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
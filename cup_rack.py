@@ -0,0 +1,115 @@
+"""The cups of a rack as parallel typed arrays, with a grid index for hit tests.
+
+CupRack keeps one array per field (struct of arrays) instead of an object or
+dict per cup: the screen layout (centre and radius) and the game state (hit
+count, time of the last hit, start of the cooldown, and the state it is
+shown in). Resetting a game and scoring a hit write into the arrays in place,
+so neither allocates.
+
+Point-to-cup lookups go through a uniform grid built once per layout. Every
+cell lists the cups that overlap it, so cup_at() checks a handful of cups
+whatever the size of the rack (15 or 21 cups, or a custom formation placed
+with place()).
+"""
+from array import array
+
+NEVER = float("-inf")
+
+
+class CupRack:
+    def __init__(self, num_cups=10):
+        self.num_cups = num_cups
+        # Layout on screen, in pixels
+        self.xs = array("i", [0]) * num_cups
+        self.ys = array("i", [0]) * num_cups
+        self.radii = array("i", [0]) * num_cups
+        # Game state
+        self.hit_counts = array("B", bytes(num_cups))
+        self.hit_times = array("d", [NEVER] * num_cups)
+        self.cooldowns = array("d", [NEVER] * num_cups)
+        self.states = array("B", bytes(num_cups))  # index into game_engine.CUP_STATES
+        self.versions = array("I", [0]) * num_cups  # bumped on every hit, to spot stale timers
+        # Grid index: the cups overlapping cell c are cell_cups[cell_starts[c]:cell_starts[c + 1]]
+        self.grid_x = self.grid_y = 0
+        self.cell_size = 1
+        self.grid_cols = self.grid_rows = 0
+        self.cell_starts = array("I", [0])
+        self.cell_cups = array("H")
+
+    def __len__(self):
+        return self.num_cups
+
+    def reset(self):
+        """Forget every hit, for a new game"""
+        for i in range(self.num_cups):
+            self.hit_counts[i] = 0
+            self.hit_times[i] = NEVER
+            self.cooldowns[i] = NEVER
+            self.states[i] = 0
+
+    # Layout
+    def place(self, cup_number, x, y, radius):
+        """Put one cup on the screen; call build_index() once all are placed"""
+        self.xs[cup_number] = int(x)
+        self.ys[cup_number] = int(y)
+        self.radii[cup_number] = int(radius)
+
+    def position(self, cup_number):
+        return self.xs[cup_number], self.ys[cup_number]
+
+    def arrange_triangle(self, start_x, start_y, radius, spacing):
+        """
+        The usual triangle: the widest row at start_y, each row below one cup
+        shorter. 4 rows for 10 cups, 5 for 15, 6 for 21.
+        """
+        rows = 1
+        while rows * (rows + 1) // 2 < self.num_cups:
+            rows += 1
+        cup_number = 0
+        for row in range(rows):
+            for col in range(rows - row):
+                if cup_number == self.num_cups:
+                    break
+                x = start_x + col * (radius * 2 + spacing) - (rows - row - 1) * (radius + spacing / 2)
+                y = start_y + row * (radius * 2 + spacing) * 0.866
+                self.place(cup_number, x, y, radius)
+                cup_number += 1
+        self.build_index()
+
+    def build_index(self):
+        """Bucket the cups into grid cells two radii wide"""
+        n = self.num_cups
+        self.cell_size = max(1, 2 * max(self.radii, default=0))
+        self.grid_x = min((self.xs[i] - self.radii[i] for i in range(n)), default=0)
+        self.grid_y = min((self.ys[i] - self.radii[i] for i in range(n)), default=0)
+        right = max((self.xs[i] + self.radii[i] for i in range(n)), default=0)
+        bottom = max((self.ys[i] + self.radii[i] for i in range(n)), default=0)
+        self.grid_cols = (right - self.grid_x) // self.cell_size + 1
+        self.grid_rows = (bottom - self.grid_y) // self.cell_size + 1
+
+        buckets = [[] for _ in range(self.grid_cols * self.grid_rows)]
+        for i in range(n):
+            x, y, r = self.xs[i] - self.grid_x, self.ys[i] - self.grid_y, self.radii[i]
+            for row in range((y - r) // self.cell_size, (y + r) // self.cell_size + 1):
+                for col in range((x - r) // self.cell_size, (x + r) // self.cell_size + 1):
+                    buckets[row * self.grid_cols + col].append(i)
+        self.cell_starts = array("I", [0])
+        self.cell_cups = array("H")
+        for bucket in buckets:
+            self.cell_cups.extend(bucket)
+            self.cell_starts.append(len(self.cell_cups))
+
+    def cup_at(self, x, y):
+        """Number of the cup under a point, or -1"""
+        col = (x - self.grid_x) // self.cell_size
+        row = (y - self.grid_y) // self.cell_size
+        if not (0 <= col < self.grid_cols and 0 <= row < self.grid_rows):
+            return -1
+        cell = row * self.grid_cols + col
+        for k in range(self.cell_starts[cell], self.cell_starts[cell + 1]):
+            i = self.cell_cups[k]
+            dx = x - self.xs[i]
+            dy = y - self.ys[i]
+            if dx * dx + dy * dy < self.radii[i] * self.radii[i]:
+                return i
+        return -1
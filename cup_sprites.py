@@ -0,0 +1,41 @@
+import pygame
+
+# Fills the corners of a sprite; no cup may be drawn in this colour
+COLORKEY = (255, 0, 255)
+
+
+class CupSprites:
+    """
+    Every look of a cup, pre-rendered once per radius.
+    draw(surface, x, y, radius, inner_color) paints one cup, and colors maps
+    each cup state to its inner colour. The corners of a sprite are
+    transparent through a colour key, which blits several times faster than
+    per-pixel alpha, and a whole rack is drawn with a single Surface.blits call.
+    """
+
+    def __init__(self, draw, colors):
+        self.draw = draw
+        self.colors = colors
+        self.surfaces = {}  # (state, radius) -> surface
+
+    def get(self, state, radius):
+        surface = self.surfaces.get((state, radius))
+        if surface is None:
+            self.render(radius)
+            surface = self.surfaces[(state, radius)]
+        return surface
+
+    def render(self, radius):
+        size = 2 * radius + 1
+        for state, inner_color in self.colors.items():
+            surface = pygame.Surface((size, size))
+            surface.fill(COLORKEY)
+            self.draw(surface, radius, radius, radius, inner_color)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()  # Blits faster in the display's pixel format
+            surface.set_colorkey(COLORKEY, pygame.RLEACCEL)
+            self.surfaces[(state, radius)] = surface
+
+    def blit_args(self, state, x, y, radius):
+        """(sprite, top left) for Surface.blits, for a cup centred on (x, y)"""
+        return self.get(state, radius), (x - radius, y - radius)
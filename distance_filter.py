@@ -0,0 +1,87 @@
+from array import array
+
+FILTER_METHODS = ("median", "ema", "hampel")
+
+# Scales the median absolute deviation to a standard deviation for normal noise
+MAD_SCALE = 1.4826
+
+
+class DistanceFilter:
+    """
+    Streaming filter over the distance readings of each sensor.
+    The last `window` readings of each sensor live in one preallocated flat
+    array of ring buffers, and filter() only works on the row of the sensor
+    that was just read, sorting it into a scratch buffer in place, so no
+    reading allocates:
+    - median: median of the window
+    - ema: exponential moving average with weight alpha for the newest reading
+    - hampel: the newest reading, unless it is more than `threshold` scaled
+      MADs away from the window median, in which case the median. The MAD is
+      at least `min_deviation` cm, so a noise-free window does not reject
+      every change.
+    A sensor's window starts out filled with its baseline, so a stray first
+    reading is filtered like any other; reset() starts it over after the
+    sensor is recalibrated.
+    """
+    __slots__ = ("method", "window", "alpha", "threshold", "min_deviation", "buffer", "positions", "ema",
+                 "scratch")
+
+    def __init__(self, num_sensors, method="median", window=3, alpha=0.3, threshold=3.0, min_deviation=1.0):
+        if method not in FILTER_METHODS:
+            raise ValueError(f"Unknown filter method {method!r}, expected one of {FILTER_METHODS}")
+        self.method = method
+        self.window = window
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_deviation = min_deviation
+        self.buffer = array("d", bytes(8 * num_sensors * window))  # sensor i: buffer[i * window:(i + 1) * window]
+        self.positions = array("i", [-1]) * num_sensors  # -1 until the first reading
+        self.ema = array("d", bytes(8 * num_sensors))
+        self.scratch = array("d", bytes(8 * window))  # the window being sorted
+
+    def filter(self, sensor_id, distance, baseline):
+        """Add a reading of one sensor and return its filtered distance"""
+        buffer = self.buffer
+        window = self.window
+        start = sensor_id * window
+        position = self.positions[sensor_id]
+        if position < 0:
+            for k in range(start, start + window):
+                buffer[k] = baseline
+            self.ema[sensor_id] = baseline
+        position = (position + 1) % window
+        buffer[start + position] = distance
+        self.positions[sensor_id] = position
+        self.ema[sensor_id] += self.alpha * (distance - self.ema[sensor_id])
+
+        if self.method == "ema":
+            return self.ema[sensor_id]
+        for k in range(window):
+            self.insert(k, buffer[start + k])
+        median = self.median()
+        if self.method == "median":
+            return median
+        for k in range(window):
+            self.insert(k, abs(buffer[start + k] - median))
+        mad = max(self.median(), self.min_deviation)
+        return distance if abs(distance - median) <= self.threshold * MAD_SCALE * mad else median
+
+    def insert(self, count, value):
+        """Insertion sort step: put value into the sorted scratch[:count]"""
+        scratch = self.scratch
+        j = count
+        while j > 0 and scratch[j - 1] > value:
+            scratch[j] = scratch[j - 1]
+            j -= 1
+        scratch[j] = value
+
+    def median(self):
+        """Median of the sorted scratch buffer"""
+        middle = self.window // 2
+        if self.window % 2:
+            return self.scratch[middle]
+        return (self.scratch[middle - 1] + self.scratch[middle]) / 2
+
+    def reset(self, sensor_id):
+        """Refill a sensor's window from its baseline on its next reading"""
+        self.positions[sensor_id] = -1
@@ -0,0 +1,209 @@
+"""Stand-in for the libgpiod v1 bindings so the sensors can run without a Pi.
+
+FakeChip hands out FakeLine objects that behave like gpiod lines: values can be
+read and written, and echo lines replay timestamped rising/falling edge events.
+The constants use the same values as the real bindings, so fake lines accept
+requests made with either module. event_get_fd() returns a pipe that turns
+readable as edges fall due, so event loops can wait on fake lines too; one
+notifier thread per line writes to it, as the kernel would.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+LINE_REQ_DIR_AS_IS = 1
+LINE_REQ_DIR_IN = 2
+LINE_REQ_DIR_OUT = 3
+LINE_REQ_EV_FALLING_EDGE = 4
+LINE_REQ_EV_RISING_EDGE = 5
+LINE_REQ_EV_BOTH_EDGES = 6
+
+SPEED_OF_SOUND = 34300  # cm/s
+
+
+class LineEvent:
+    RISING_EDGE = 1
+    FALLING_EDGE = 2
+
+    def __init__(self, type, timestamp_ns, source=None):
+        self.type = type
+        self.sec, self.nsec = divmod(int(timestamp_ns), 1_000_000_000)
+        self.source = source
+
+    def __repr__(self):
+        edge = "RISING" if self.type == LineEvent.RISING_EDGE else "FALLING"
+        return f"LineEvent({edge}, {self.sec}.{self.nsec:09d})"
+
+
+class FakeLine:
+    def __init__(self, chip, offset):
+        self.chip = chip
+        self.offset = offset
+        self.consumer = None
+        self.type = None
+        self.value = 0
+        self.edges = deque()  # pending (timestamp_ns, event type), oldest first
+        self.pipe = None  # (read fd, write fd) once event_get_fd() was called
+        self.pipe_lock = threading.Lock()
+        self.notify_ready = threading.Condition(self.pipe_lock)  # wakes the notifier thread
+        self.pending = deque()  # timestamps of edges still to be signalled on the pipe
+        self.early_reads = 0  # edges read before their byte was written to the pipe
+
+    def request(self, consumer, type=LINE_REQ_DIR_AS_IS, flags=0, default_val=0):
+        self.consumer = consumer
+        self.type = type
+        self.value = default_val
+
+    def release(self):
+        self.consumer = None
+        self.type = None
+        with self.notify_ready:
+            if self.pipe:
+                for fd in self.pipe:
+                    os.close(fd)
+                self.pipe = None
+                self.pending.clear()
+                self.early_reads = 0
+                self.notify_ready.notify()  # Lets the notifier thread exit
+
+    def set_value(self, value):
+        falling = self.value == 1 and value == 0
+        self.value = value
+        if falling:
+            self.chip.line_triggered(self)
+
+    def get_value(self):
+        now = self.chip.clock.monotonic_ns()
+        while self.edges and self.edges[0][0] <= now:
+            self._apply(*self.edges.popleft())
+        return self.value
+
+    def replay(self, events):
+        """Queue (event type, timestamp_ns) edges, timestamps on the monotonic clock"""
+        events = sorted(events, key=lambda e: e[1])
+        for event_type, timestamp_ns in events:
+            self.edges.append((timestamp_ns, event_type))
+        with self.notify_ready:
+            if self.pipe:
+                self.pending.extend(timestamp_ns for _, timestamp_ns in events)
+                self.notify_ready.notify()
+
+    def event_get_fd(self):
+        """Descriptor that is readable while an edge is due, like the fd of a real line"""
+        with self.notify_ready:
+            if self.pipe is None:
+                self.pipe = os.pipe()
+                os.set_blocking(self.pipe[0], False)
+                threading.Thread(target=self._notify, args=(self.pipe,), name=f"fake-line-{self.offset}",
+                                 daemon=True).start()
+            return self.pipe[0]
+
+    def _notify(self, pipe):
+        """
+        Stands in for the kernel: makes the pipe readable when each pending edge
+        happens. Runs until the line is released.
+        """
+        clock = self.chip.clock
+        while True:
+            with self.notify_ready:
+                while self.pipe is pipe and not self.pending:
+                    self.notify_ready.wait()
+                if self.pipe is not pipe:
+                    return
+                timestamp_ns = self.pending[0]
+            delay = timestamp_ns - clock.monotonic_ns()
+            if delay > 0:
+                clock.sleep(delay / 1e9)
+            with self.notify_ready:
+                if self.pipe is not pipe:
+                    return  # Released while sleeping
+                self.pending.popleft()
+                if self.early_reads:
+                    self.early_reads -= 1
+                else:
+                    os.write(pipe[1], b"\0")
+
+    def event_wait(self, sec=0, nsec=0):
+        clock = self.chip.clock
+        deadline = clock.monotonic_ns() + sec * 1_000_000_000 + nsec
+        if self.edges and self.edges[0][0] <= deadline:
+            delay = self.edges[0][0] - clock.monotonic_ns()
+            if delay > 0:
+                clock.sleep(delay / 1e9)
+            return True
+        delay = deadline - clock.monotonic_ns()
+        if delay > 0:
+            clock.sleep(delay / 1e9)
+        return False
+
+    def event_read(self):
+        if self.pipe:
+            with self.pipe_lock:
+                try:
+                    os.read(self.pipe[0], 1)
+                except BlockingIOError:
+                    self.early_reads += 1  # Its byte is still to come; don't let it wake anyone
+        timestamp_ns, event_type = self.edges.popleft()
+        self._apply(timestamp_ns, event_type)
+        return LineEvent(event_type, timestamp_ns, self)
+
+    def _apply(self, timestamp_ns, event_type):
+        self.value = 1 if event_type == LineEvent.RISING_EDGE else 0
+
+
+class FakeChip:
+    """Chip whose echo lines answer each trigger pulse with a scripted distance.
+
+    Call script(trigger_pin, echo_pin, distances) to wire a sensor; every falling
+    edge written to the trigger line queues one echo pulse whose width matches
+    the next distance (in cm). A distance of None produces no echo at all.
+    Timestamps and waits go through clock, which defaults to the time module.
+    """
+
+    def __init__(self, name="fake", echo_delay=0.0002, clock=time):
+        self.name = name
+        self.echo_delay = echo_delay
+        self.clock = clock
+        self.lines = {}
+        self.echo_pins = {}  # trigger pin -> echo pin
+        self.distances = {}  # trigger pin -> deque of scripted distances
+
+    def get_line(self, offset):
+        if offset not in self.lines:
+            self.lines[offset] = FakeLine(self, offset)
+        return self.lines[offset]
+
+    def connect(self, trigger_pin, echo_pin):
+        self.echo_pins[trigger_pin] = echo_pin
+
+    def script(self, trigger_pin, echo_pin, distances):
+        self.connect(trigger_pin, echo_pin)
+        self.distances[trigger_pin] = deque(distances)
+
+    def next_distance(self, trigger_pin):
+        distances = self.distances.get(trigger_pin)
+        if not distances:
+            return None
+        return distances.popleft()
+
+    def line_triggered(self, line):
+        echo_pin = self.echo_pins.get(line.offset)
+        if echo_pin is None:
+            return
+        distance = self.next_distance(line.offset)
+        if distance is not None:
+            self.echo(echo_pin, distance)
+
+    def echo(self, echo_pin, distance):
+        """Queue one echo pulse on echo_pin for a target distance cm away"""
+        rising = self.clock.monotonic_ns() + int(self.echo_delay * 1e9)
+        width = int(distance * 2 / SPEED_OF_SOUND * 1e9)
+        self.get_line(echo_pin).replay([
+            (LineEvent.RISING_EDGE, rising),
+            (LineEvent.FALLING_EDGE, rising + width),
+        ])
+
+    def close(self):
+        for line in self.lines.values():
+            line.release()
@@ -0,0 +1,117 @@
+"""Opt-in per-frame profiler for the pygame main loop.
+
+Each frame is split into named phases (events, sensor hits, render, present,
+tick, ...). The loop calls phase(name) whenever it moves on to the next part
+of the frame, so timing is one perf_counter_ns() call per phase. The last
+`capacity` frames are kept in a ring buffer, together with instant events
+such as sensor hits and saved scores, and can be dumped as a Chrome
+trace-event file (open it in chrome://tracing or https://ui.perfetto.dev).
+
+While disabled, every method returns immediately.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class FrameProfiler:
+    def __init__(self, capacity=600, enabled=False):
+        self.enabled = enabled
+        self.frames = deque(maxlen=capacity)  # (frame number, start ns, end ns, [(phase, start ns, end ns)])
+        self.marks = deque(maxlen=capacity)  # (name, ns, thread name, args)
+        self.frame_number = 0
+        self.frame_start = None
+        self.phases = []
+        self.phase_name = None
+        self.phase_start = 0
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = self.phase_start = time.perf_counter_ns()
+        self.phases = []
+        self.phase_name = None
+
+    def phase(self, name):
+        """End the current phase of the frame and start the next one"""
+        if not self.enabled or self.frame_start is None:
+            return
+        now = time.perf_counter_ns()
+        if self.phase_name is not None:
+            self.phases.append((self.phase_name, self.phase_start, now))
+        self.phase_name = name
+        self.phase_start = now
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        now = time.perf_counter_ns()
+        if self.phase_name is not None:
+            self.phases.append((self.phase_name, self.phase_start, now))
+        self.frames.append((self.frame_number, self.frame_start, now, self.phases))
+        self.frame_number += 1
+        self.frame_start = None
+
+    def mark(self, name, **args):
+        """Record an instant event; safe to call from any thread"""
+        if not self.enabled:
+            return
+        self.marks.append((name, time.perf_counter_ns(), threading.current_thread().name, args))
+
+    def summary(self):
+        """Frame and per-phase duration percentiles over the buffered frames, in ms"""
+        def percentiles(durations):
+            ordered = sorted(durations)
+            return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] / 1e6 for q in (0.5, 0.99)}
+
+        frames = list(self.frames)
+        if not frames:
+            return {}
+        by_phase = {}
+        for _, _, _, phases in frames:
+            for name, start, end in phases:
+                by_phase.setdefault(name, []).append(end - start)
+        result = {"frame": percentiles([end - start for _, start, end, _ in frames])}
+        for name, durations in by_phase.items():
+            result[name] = percentiles(durations)
+        return result
+
+    def chrome_trace(self):
+        """The buffered frames and marks as a Chrome trace-event dict"""
+        pid = os.getpid()
+        main_thread = threading.main_thread().name
+        thread_ids = {main_thread: 1}
+        events = []
+        for number, start, end, phases in list(self.frames):
+            events.append({"name": "frame", "ph": "X", "pid": pid, "tid": 1,
+                           "ts": start / 1000, "dur": (end - start) / 1000, "args": {"frame": number}})
+            for name, phase_start, phase_end in phases:
+                events.append({"name": name, "ph": "X", "pid": pid, "tid": 1,
+                               "ts": phase_start / 1000, "dur": (phase_end - phase_start) / 1000})
+        for name, timestamp, thread_name, args in list(self.marks):
+            tid = thread_ids.setdefault(thread_name, len(thread_ids) + 1)
+            events.append({"name": name, "ph": "i", "s": "t", "pid": pid, "tid": tid,
+                           "ts": timestamp / 1000, "args": args})
+        for thread_name, tid in thread_ids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": thread_name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        """Write the trace to path and log the frame-time summary"""
+        if not self.enabled:
+            return
+        try:
+            with open(path, "w") as f:
+                json.dump(self.chrome_trace(), f)
+        except OSError as e:
+            logger.error("Failed to write frame trace: %s", e)
+            return
+        for name, quantiles in self.summary().items():
+            logger.info("%s: p50 %.2fms p99 %.2fms", name, quantiles[0.5], quantiles[0.99])
+        logger.info("Frame trace of %d frames written to %s", len(self.frames), path)
@@ -0,0 +1,152 @@
+"""Beer pong rules and game flow, without pygame.
+
+GameEngine holds the whole state of a game and only changes it through
+tick(dt) and its input methods, so it runs without a display or a database:
+the pygame front ends draw from it, and simulations can play thousands of
+games per second by ticking it with made-up time.
+
+Time is whatever the caller says it is. The front ends tick it with wall
+clock time, so hit timestamps from the sensors can be passed in as is.
+
+The state a cup is shown in changes on timers: a hit schedules the moments
+its combo window or cooldown runs out on a heap, and tick() applies the
+transitions that fell due, in O(log n) each. Drawing only reads the states,
+and how often or how late frames come changes nothing but when a colour
+change shows.
+"""
+import heapq
+
+from cup_rack import CupRack
+
+# Scoring rules
+FIRST_HIT_POINTS = 1
+SECOND_HIT_POINTS = 3  # second hit within SECOND_HIT_WINDOW of the first
+THIRD_HIT_POINTS = 5  # third hit within THIRD_HIT_WINDOW of the second
+SECOND_HIT_WINDOW = 3.0
+THIRD_HIT_WINDOW = 2.0
+COOLDOWN = 1.0  # seconds a cup ignores hits after a third hit
+
+# Game flow: start_screen -> input_name -> countdown -> playing -> game_over -> start_screen
+STATES = ("start_screen", "input_name", "countdown", "playing", "game_over")
+
+# States of a cup, indexed by CupRack.states
+CUP_STATES = ("idle", "first_hit", "second_hit", "cooldown")
+IDLE, FIRST_HIT, SECOND_HIT, IN_COOLDOWN = range(len(CUP_STATES))
+
+
+class GameEngine:
+    def __init__(self, num_cups=10, game_duration=10, countdown=3, now=0.0):
+        self.num_cups = num_cups
+        self.game_duration = game_duration  # seconds
+        self.countdown = countdown  # seconds
+        self.now = now
+        self.state = "start_screen"
+        self.state_started = now
+        self.player_name = ""
+        self.score = 0
+        self.rack = CupRack(num_cups)  # per-cup state, and the layout once a front end sets one
+        self.timers = []  # heap of (due time, cup number, cup version, state to enter)
+        self.game_over_callback = None
+
+    def set_game_over_callback(self, callback):
+        """callback(player_name, score) is called when a game ends"""
+        self.game_over_callback = callback
+
+    def reset_cups(self):
+        """Clear every cup's hits and pending state changes, for a new game"""
+        self.rack.reset()
+        self.timers = []
+
+    def schedule(self, at, cup_number, state):
+        """Put a cup in state at time at, unless it is hit again before then"""
+        heapq.heappush(self.timers, (at, cup_number, self.rack.versions[cup_number], state))
+
+    def run_timers(self):
+        """Apply the cup state transitions that are due"""
+        timers = self.timers
+        rack = self.rack
+        while timers and timers[0][0] <= self.now:
+            _, cup_number, version, state = heapq.heappop(timers)
+            if version == rack.versions[cup_number]:
+                rack.states[cup_number] = state
+
+    def set_state(self, state):
+        self.state = state
+        self.state_started = self.now
+
+    def tick(self, dt):
+        """Advance the game clock by dt seconds and apply timed state changes"""
+        self.now += dt
+        self.run_timers()
+        if self.state == "countdown" and self.countdown_remaining() <= 0:
+            self.set_state("playing")
+            self.score = 0
+            self.reset_cups()  # Hits and combos of the last game do not carry over
+        elif self.state == "playing" and self.remaining_time() == 0:
+            self.set_state("game_over")
+            if self.game_over_callback:
+                self.game_over_callback(self.player_name, self.score)
+
+    def countdown_remaining(self):
+        """Whole seconds left before the game starts"""
+        return self.countdown - int(self.now - self.state_started)
+
+    def remaining_time(self):
+        """Whole seconds left of the game"""
+        return max(0, self.game_duration - int(self.now - self.state_started))
+
+    # Input
+    def show_name_entry(self):
+        if self.state == "start_screen":
+            self.set_state("input_name")
+            self.player_name = ""
+
+    def start_countdown(self):
+        """Start the game, once a name has been entered"""
+        if self.state == "input_name" and self.player_name.strip():
+            self.set_state("countdown")
+
+    def return_to_start(self):
+        if self.state == "game_over":
+            self.set_state("start_screen")
+
+    def hit(self, cup_number, timestamp=None):
+        """
+        Score a hit on a cup; returns the points it earned (0 while the cup cools down).
+        timestamp is when the hit happened (defaults to now); combo windows are
+        measured between hit timestamps, not between the times hits are processed.
+        """
+        if not 0 <= cup_number < self.num_cups:
+            return 0
+        rack = self.rack
+        current_time = self.now if timestamp is None else timestamp
+        if current_time - rack.cooldowns[cup_number] < COOLDOWN:
+            return 0
+        hits = rack.hit_counts[cup_number]
+        since_last_hit = current_time - rack.hit_times[cup_number]
+        rack.versions[cup_number] += 1  # Timers set by earlier hits no longer apply
+        if hits == 2 and since_last_hit < THIRD_HIT_WINDOW:
+            points = THIRD_HIT_POINTS
+            rack.cooldowns[cup_number] = current_time
+            rack.states[cup_number] = IN_COOLDOWN
+            # After the cooldown another hit still counts as a third one, until the window closes
+            self.schedule(current_time + COOLDOWN, cup_number, SECOND_HIT)
+            self.schedule(current_time + THIRD_HIT_WINDOW, cup_number, IDLE)
+        elif hits == 1 and since_last_hit < SECOND_HIT_WINDOW:
+            points = SECOND_HIT_POINTS
+            rack.hit_counts[cup_number] = 2
+            rack.states[cup_number] = SECOND_HIT
+            self.schedule(current_time + THIRD_HIT_WINDOW, cup_number, IDLE)
+        else:
+            points = FIRST_HIT_POINTS
+            rack.hit_counts[cup_number] = 1
+            rack.states[cup_number] = FIRST_HIT
+            self.schedule(current_time + SECOND_HIT_WINDOW, cup_number, IDLE)
+        rack.hit_times[cup_number] = current_time
+        self.score += points
+        self.run_timers()  # A hit timestamped in the past may already be over
+        return points
+
+    def cup_state(self, cup_number):
+        """"cooldown", "second_hit", "first_hit" or "idle", for drawing the cup"""
+        return CUP_STATES[self.rack.states[cup_number]]
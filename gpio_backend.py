@@ -0,0 +1,156 @@
+"""Chip backends for SensorSystem.
+
+A backend opens the GPIO chip and supplies the clock the sensor code uses for
+timing (anything with time(), monotonic(), monotonic_ns() and sleep(), such as
+the time module). GpiodBackend drives the real HC-SR04s on the Pi; the
+SimulatedBackend generates echo pulses from scripted distance traces so the
+whole pipeline can run, and be profiled, on any Linux machine.
+
+Set PYCUP_SIMULATE=1 to make default_backend() return a simulator with random
+ball drops, e.g. to run beer_pong_game.py without the table attached.
+"""
+import bisect
+import os
+import random
+import time
+
+from fake_gpiod import FakeChip
+
+try:
+    import gpiod
+except ImportError:
+    gpiod = None
+
+
+class GpiodBackend:
+    def __init__(self, chip_name='4'):  # '4' is the header GPIO chip on a Raspberry Pi 5
+        self.chip_name = chip_name
+        self.clock = time
+
+    def open_chip(self):
+        if gpiod is None:
+            raise RuntimeError("The gpiod bindings are not installed; use SimulatedBackend off the Pi")
+        return gpiod.Chip(self.chip_name)
+
+    def connect_sensor(self, chip, trigger_pin, echo_pin):
+        pass  # Real sensors are wired on the board
+
+
+class SimClock:
+    """Clock that runs time_scale times faster than real time"""
+
+    def __init__(self, time_scale=1.0):
+        self.time_scale = time_scale
+        self.start_ns = time.monotonic_ns()
+        self.start_time = time.time()
+
+    def monotonic_ns(self):
+        return self.start_ns + int((time.monotonic_ns() - self.start_ns) * self.time_scale)
+
+    def monotonic(self):
+        return self.monotonic_ns() / 1e9
+
+    def time(self):
+        return self.start_time + self.elapsed()
+
+    def elapsed(self):
+        """Simulated seconds since the clock was created"""
+        return (self.monotonic_ns() - self.start_ns) / 1e9
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.time_scale)
+
+
+class SimulatedBackend:
+    """
+    Simulated HC-SR04s. Each sensor follows a distance trace (cm) over simulated
+    time, optionally with gaussian noise, dropped echoes and ball drops on top.
+    A trace is a constant, a list of (seconds, distance) steps, or a function of
+    the simulated time in seconds.
+    """
+
+    def __init__(self, baseline=30.0, noise=0.0, dropout_rate=0.0, drop_rate=0.0,
+                 drop_duration=0.5, time_scale=1.0, seed=None):
+        self.baseline = baseline
+        self.noise = noise                  # standard deviation in cm
+        self.dropout_rate = dropout_rate    # fraction of pings with no echo
+        self.drop_rate = drop_rate          # random ball drops per sensor per second
+        self.drop_duration = drop_duration  # seconds a ball stays in view
+        self.clock = SimClock(time_scale)
+        self.random = random.Random(seed)
+        self.traces = {}      # trigger pin -> trace
+        self.drops = {}       # trigger pin -> list of (start, end, distance)
+        self.last_ping = {}   # trigger pin -> simulated time of previous ping
+        self.pings = 0
+        self.echoes = 0
+
+    def open_chip(self):
+        return SimulatedChip(self)
+
+    def connect_sensor(self, chip, trigger_pin, echo_pin):
+        chip.connect(trigger_pin, echo_pin)
+
+    def set_trace(self, trigger_pin, trace):
+        self.traces[trigger_pin] = trace
+
+    def drop_ball(self, trigger_pin, at=None, duration=None, distance=None):
+        """Schedule a ball in front of a sensor, at a simulated time (default now)"""
+        start = self.clock.elapsed() if at is None else at
+        end = start + (self.drop_duration if duration is None else duration)
+        if distance is None:
+            distance = self.trace_distance(trigger_pin, start) * 0.3
+        self.drops.setdefault(trigger_pin, []).append((start, end, distance))
+
+    def trace_distance(self, trigger_pin, t):
+        trace = self.traces.get(trigger_pin, self.baseline)
+        if callable(trace):
+            return trace(t)
+        if isinstance(trace, (list, tuple)):
+            index = bisect.bisect_right([step for step, _ in trace], t) - 1
+            return trace[max(0, index)][1]
+        return trace
+
+    def distance(self, trigger_pin):
+        """Distance the echo of a ping sent now reports, or None for a dropout"""
+        t = self.clock.elapsed()
+        self.pings += 1
+
+        if self.drop_rate:
+            since_last = t - self.last_ping.get(trigger_pin, t)
+            if self.random.random() < self.drop_rate * since_last:
+                self.drop_ball(trigger_pin, at=t)
+        self.last_ping[trigger_pin] = t
+
+        if self.dropout_rate and self.random.random() < self.dropout_rate:
+            return None
+
+        distance = self.trace_distance(trigger_pin, t)
+        drops = self.drops.get(trigger_pin)
+        if drops:
+            # Forget drops that are over, the ball is out of view
+            drops[:] = [drop for drop in drops if drop[1] > t]
+            for start, end, drop_distance in drops:
+                if start <= t:
+                    distance = drop_distance
+                    break
+        if self.noise:
+            distance += self.random.gauss(0, self.noise)
+        self.echoes += 1
+        return max(2.0, distance)  # The HC-SR04 cannot see closer than ~2 cm
+
+
+class SimulatedChip(FakeChip):
+    def __init__(self, backend):
+        super().__init__("sim", clock=backend.clock)
+        self.backend = backend
+
+    def next_distance(self, trigger_pin):
+        return self.backend.distance(trigger_pin)
+
+
+def default_backend(chip_name='4'):
+    """Real hardware, unless PYCUP_SIMULATE is set in the environment"""
+    if os.environ.get("PYCUP_SIMULATE"):
+        time_scale = float(os.environ.get("PYCUP_TIME_SCALE", "1"))
+        return SimulatedBackend(noise=0.2, dropout_rate=0.01, drop_rate=0.1, time_scale=time_scale)
+    return GpiodBackend(chip_name)
@@ -0,0 +1,90 @@
+"""Hits from the keyboard and from synthetic streams, for testing without sensors.
+
+A digit key scores one hit on its cup when it goes down (a KEYDOWN event),
+however long it is held. A HitStream produces hits at a fixed rate on a
+seeded random choice of cups. Every hit carries the time it was scheduled
+for, not the time a frame got round to it, so a stream scores the same
+however fast or unevenly the game loop runs:
+
+    hit_input.start_stream(50, time.time(), count=500, seed=1)   # from a script
+    F5 in the game toggles a stream at PYCUP_HIT_RATE hits per second
+"""
+import random
+import threading
+from collections import deque
+
+import pygame
+
+# Keys 0-9 hit cups 0-9
+DIGIT_KEYS = {pygame.K_0 + i: i for i in range(10)}
+
+
+class HitStream:
+    def __init__(self, rate, start, cups=range(10), count=None, seed=0):
+        self.interval = 1 / rate
+        self.start = start
+        self.cups = list(cups)
+        self.count = count  # None to run until stopped
+        self.random = random.Random(seed)
+        self.sent = 0
+
+    def finished(self):
+        return self.count is not None and self.sent >= self.count
+
+    def due(self, now):
+        """Yield the (cup number, timestamp) hits scheduled up to now"""
+        while not self.finished():
+            timestamp = self.start + self.sent * self.interval
+            if timestamp > now:
+                break
+            self.sent += 1
+            yield self.random.choice(self.cups), timestamp
+
+
+class HitInput:
+    def __init__(self, num_cups=10):
+        self.num_cups = num_cups
+        self.pending = deque()  # (cup number, timestamp) from key presses
+        self.streams = []
+        self.lock = threading.Lock()  # scripts may start streams from other threads
+
+    def key_down(self, key, now):
+        """Queue a hit if key is a digit; returns True if it was"""
+        cup_number = DIGIT_KEYS.get(key)
+        if cup_number is None or cup_number >= self.num_cups:
+            return False
+        self.pending.append((cup_number, now))
+        return True
+
+    def start_stream(self, rate, start, count=None, cups=None, seed=0):
+        """Hit cups (default all) rate times per second from time start, count times or until stopped"""
+        stream = HitStream(rate, start, range(self.num_cups) if cups is None else cups, count, seed)
+        with self.lock:
+            self.streams.append(stream)
+        return stream
+
+    def toggle_stream(self, rate, now):
+        """Start a stream, or stop the running ones"""
+        with self.lock:
+            running = bool(self.streams)
+            self.streams = []
+        if not running:
+            self.start_stream(rate, now)
+
+    def poll(self, now, hit):
+        """
+        Pass every hit due by now to hit(cup_number, timestamp), oldest first.
+        With hit=None the hits are dropped, e.g. while no game is running.
+        """
+        hits = list(self.pending)
+        self.pending.clear()
+        with self.lock:
+            for stream in self.streams:
+                hits.extend(stream.due(now))
+            self.streams = [stream for stream in self.streams if not stream.finished()]
+        if hit is None:
+            return 0
+        hits.sort(key=lambda h: h[1])
+        for cup_number, timestamp in hits:
+            hit(cup_number, timestamp)
+        return len(hits)
@@ -0,0 +1,31 @@
+import time
+from collections import deque
+
+
+class HitQueue:
+    """
+    Bounded queue of timestamped hits, pushed by the sensor threads and drained
+    by the game loop once per frame.
+    deque.append and deque.popleft are atomic in CPython, so neither side takes
+    a lock. When the queue is full the oldest hit is dropped and counted.
+    """
+
+    def __init__(self, maxlen=256):
+        self.events = deque(maxlen=maxlen)
+        self.dropped = 0
+
+    def push(self, cup_number, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append((cup_number, timestamp))
+
+    def drain(self):
+        """Yield the (cup_number, timestamp) hits queued so far, oldest first"""
+        # Hits pushed while draining are left for the next frame
+        for _ in range(len(self.events)):
+            yield self.events.popleft()
+
+    def __len__(self):
+        return len(self.events)
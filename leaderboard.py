@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+
+def format_score(name, score, date):
+    """Leaderboard line for one high_scores row (date as stored by SQLite, in UTC)"""
+    date_obj = datetime.strptime(date, '%Y-%m-%d %H:%M:%S')
+    date_str = date_obj.strftime('%m/%d/%Y')
+    return f"{name}: {score} ({date_str})"
+
+
+class Leaderboard:
+    """
+    In-memory copy of the top high scores, already formatted for drawing.
+    The table is read from the database once; after that new scores are merged
+    in memory by add(), so drawing a frame never touches the disk.
+    version increases whenever the rows change.
+    """
+
+    def __init__(self, fetch_scores, limit=10):
+        self.fetch_scores = fetch_scores
+        self.limit = limit
+        self.entries = None  # (name, score, formatted line), highest score first
+        self.lines = []
+        self.version = 0
+
+    def load(self):
+        self.entries = [
+            (name, score, format_score(name, score, date))
+            for name, score, date in self.fetch_scores(self.limit)
+        ]
+        self.lines = [line for _, _, line in self.entries]
+        self.version += 1
+
+    def invalidate(self):
+        """Drop the cached rows; they are reloaded from the database on next use"""
+        self.entries = None
+
+    def add(self, name, score):
+        """Merge a score that was just saved to the database"""
+        if self.entries is None:
+            return  # Not loaded yet, the next load() will include it
+        # Equal scores keep their existing order, like ORDER BY score DESC does
+        index = sum(1 for _, existing, _ in self.entries if existing >= score)
+        if index >= self.limit:
+            return
+        date = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self.entries.insert(index, (name, score, format_score(name, score, date)))
+        del self.entries[self.limit:]
+        self.lines = [line for _, _, line in self.entries]
+        self.version += 1
+
+    def rows(self):
+        if self.entries is None:
+            self.load()
+        return self.lines
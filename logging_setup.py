@@ -0,0 +1,97 @@
+"""Non-blocking, rate-limited logging.
+
+setup_logging() routes every log record through a bounded in-memory queue. A
+background QueueListener thread formats the records and writes them out, so
+a slow console or journald never blocks the sensor thread or the game loop;
+when the queue is full, records are dropped rather than waited for.
+A RateLimitFilter on the producer side additionally caps how often any one
+message template is logged, so a stuck sensor cannot flood the log.
+"""
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(threadName)s %(name)s: %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per (logger, message template): at most `burst` records at
+    once, refilled at `rate` records per second. The number of records that
+    were dropped is appended to the next one that gets through.
+    """
+
+    def __init__(self, rate=5.0, burst=10):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}  # (logger name, msg) -> [tokens, last refill, dropped]
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [self.burst, now, 0]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.msg = f"{record.msg} ({bucket[2]} similar messages suppressed)"
+            bucket[2] = 0
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: records that do not fit are counted and dropped"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in the same process, so leave formatting to its thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+
+
+def setup_logging(level=logging.INFO, stream=None, max_queued=10000, rate=5.0, burst=10):
+    """Install the queue handler on the root logger and start the writer thread"""
+    global _listener
+    if _listener is not None:
+        return _listener
+    log_queue = queue.Queue(maxsize=max_queued)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(rate, burst))
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
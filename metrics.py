@@ -0,0 +1,163 @@
+"""Low-overhead counters and histograms for the sensor pipeline.
+
+Recording is a few integer additions and a bisect, with no locks: counters
+are only written from the sensor thread, and readers may see a snapshot that
+is one sample behind. Metrics can be exported as a dict or as Prometheus
+text (for the node_exporter textfile collector).
+"""
+import bisect
+import os
+import time
+
+TOF_BUCKETS = (0.0002, 0.0005, 0.001, 0.002, 0.003, 0.005, 0.01, 0.025)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+DURATION_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None without samples)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"buckets": buckets, "sum": self.sum, "count": self.count,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class SensorMetrics:
+    """Per-sensor ping statistics, updated by UltrasonicSensor.measure_distance"""
+    __slots__ = ("pings", "timeouts", "hits", "time_of_flight", "started")
+
+    def __init__(self):
+        self.pings = 0
+        self.timeouts = 0
+        self.hits = 0
+        self.time_of_flight = Histogram(TOF_BUCKETS)
+        self.started = time.monotonic()
+
+    def record_ping(self, time_of_flight):
+        self.pings += 1
+        if time_of_flight is None:
+            self.timeouts += 1
+        elif time_of_flight > 0:  # A pulse too short to time says nothing about the distance
+            self.time_of_flight.observe(time_of_flight)
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            "pings": self.pings,
+            "timeouts": self.timeouts,
+            "hits": self.hits,
+            "pings_per_second": self.pings / elapsed if elapsed > 0 else 0.0,
+            "time_of_flight": self.time_of_flight.snapshot(),
+        }
+
+
+class SystemMetrics:
+    """
+    Metrics of a whole SensorSystem: the sensors' own metrics plus
+    - detection_latency: echo received to hit callback called
+    - callback_duration: time spent inside the hit callback
+    - score_latency: echo received to the hit being scored by the game
+    """
+
+    def __init__(self, sensors):
+        self.sensors = sensors
+        self.detection_latency = Histogram(LATENCY_BUCKETS)
+        self.callback_duration = Histogram(DURATION_BUCKETS)
+        self.score_latency = Histogram(LATENCY_BUCKETS)
+
+    def snapshot(self):
+        return {
+            "sensors": {sensor.sensor_id: sensor.metrics.snapshot() for sensor in self.sensors},
+            "detection_latency": self.detection_latency.snapshot(),
+            "callback_duration": self.callback_duration.snapshot(),
+            "score_latency": self.score_latency.snapshot(),
+        }
+
+    def prometheus_text(self):
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in series:
+                cumulative = 0
+                for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels}le="{le}"}} {cumulative}')
+                selector = f"{{{labels.rstrip(',')}}}" if labels else ""
+                lines.append(f"{name}_sum{selector} {hist.sum}")
+                lines.append(f"{name}_count{selector} {hist.count}")
+
+        for name, attr, help_text in (
+            ("pycup_sensor_pings_total", "pings", "Pings sent"),
+            ("pycup_sensor_timeouts_total", "timeouts", "Pings without an echo"),
+            ("pycup_sensor_hits_total", "hits", "Hits detected"),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for sensor in self.sensors:
+                lines.append(f'{name}{{sensor="{sensor.sensor_id}"}} {getattr(sensor.metrics, attr)}')
+
+        histogram("pycup_sensor_time_of_flight_seconds", "Echo pulse width",
+                  [(f'sensor="{sensor.sensor_id}",', sensor.metrics.time_of_flight) for sensor in self.sensors])
+        histogram("pycup_detection_latency_seconds", "Echo to hit callback",
+                  [("", self.detection_latency)])
+        histogram("pycup_callback_duration_seconds", "Time spent in the hit callback",
+                  [("", self.callback_duration)])
+        histogram("pycup_score_latency_seconds", "Echo to hit scored by the game",
+                  [("", self.score_latency)])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Rename into place so the collector never reads half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def overlay_lines(self):
+        """Short text lines summarizing the metrics, for the on-screen overlay"""
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.1f}ms"
+
+        lines = []
+        for sensor in self.sensors:
+            m = sensor.metrics
+            elapsed = time.monotonic() - m.started
+            rate = m.pings / elapsed if elapsed > 0 else 0.0
+            lines.append(f"S{sensor.sensor_id}: {rate:.1f} pings/s  {m.timeouts} timeouts  "
+                         f"{m.hits} hits  tof p50 {ms(m.time_of_flight.quantile(0.5))}")
+        lines.append(f"detect->callback p50 {ms(self.detection_latency.quantile(0.5))} "
+                     f"p99 {ms(self.detection_latency.quantile(0.99))}")
+        lines.append(f"callback p99 {ms(self.callback_duration.quantile(0.99))}  "
+                     f"detect->score p99 {ms(self.score_latency.quantile(0.99))}")
+        return lines
@@ -0,0 +1,206 @@
+"""Several cup racks (tables) driven from one host.
+
+Every rack has its own sensors, GameEngine and leaderboard partition. The
+sensor loops are sharded over worker processes, so racks do not compete for
+one GIL; workers only send hits back, as (rack name, cup, timestamp) tuples
+over a queue. The main process owns the engines and the score database,
+since SQLite wants a single writer.
+
+Racks are configured in a JSON file:
+
+    {
+      "workers": 2,
+      "racks": [
+        {"name": "table1", "chip": "4", "game_duration": 10,
+         "sensors": [{"trigger": 23, "echo": 24}, {"trigger": 17, "echo": 27}]},
+        {"name": "table2", "chip": "5",
+         "sensors": [{"trigger": 22, "echo": 10}]}
+      ]
+    }
+
+    python racks.py racks.json    # run every rack headless
+
+Without a screen per table, a game starts when the operator types the rack
+and the player's name on stdin ("table1 Alice"); racks wait on the start
+screen otherwise, so only games that were really played get a score.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from game_engine import GameEngine
+from gpio_backend import default_backend
+from leaderboard import Leaderboard
+from logging_setup import setup_logging, shutdown_logging
+from score_store import ScoreStore
+from sensor_integration import start_sensor_system
+
+logger = logging.getLogger(__name__)
+
+
+class RackConfig:
+    def __init__(self, name, chip='4', sensor_pins=None, game_duration=10):
+        self.name = name
+        self.chip = chip
+        self.sensor_pins = sensor_pins  # None for the default SENSOR_PINS
+        self.game_duration = game_duration
+
+
+def load_racks(path):
+    """(rack configs, number of workers or None) from a JSON file"""
+    with open(path) as f:
+        data = json.load(f)
+    racks = [
+        RackConfig(rack["name"], rack.get("chip", '4'), rack.get("sensors"), rack.get("game_duration", 10))
+        for rack in data["racks"]
+    ]
+    return racks, data.get("workers")
+
+
+def shard(racks, workers):
+    """Split racks round-robin into at most `workers` groups"""
+    workers = max(1, min(workers, len(racks)))
+    return [racks[i::workers] for i in range(workers)]
+
+
+def run_worker(racks, hits, stop):
+    """Worker process: run the sensor systems of some racks until stop is set"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the main process
+    setup_logging()
+    systems = []
+    try:
+        for rack in racks:
+            system = start_sensor_system(default_backend(rack.chip), sensor_pins=rack.sensor_pins,
+                                         baseline_file=f"sensor_baselines_{rack.name}.json")
+            system.set_hit_callback(lambda sensor_id, timestamp, name=rack.name: hits.put((name, sensor_id, timestamp)))
+            systems.append(system)
+            logger.info("Rack %s: %d sensors running", rack.name, len(system.sensors))
+        stop.wait()
+    finally:
+        for system in systems:
+            system.stop_monitoring()
+        shutdown_logging()
+
+
+class Rack:
+    """Game state and leaderboard of one rack"""
+
+    def __init__(self, config, score_store):
+        self.config = config
+        self.name = config.name
+        self.score_store = score_store
+        self.engine = GameEngine(game_duration=config.game_duration, now=time.time())
+        self.engine.set_game_over_callback(self.save_score)
+        self.leaderboard = Leaderboard(lambda limit: score_store.top(limit, self.name))
+
+    def save_score(self, player_name, score):
+        self.score_store.save(player_name, score, self.name)
+        self.leaderboard.add(player_name, score)
+
+    def start_game(self, player_name):
+        """Start a game for a player; returns False if one is already running"""
+        engine = self.engine
+        if engine.state not in ("start_screen", "game_over"):
+            return False
+        engine.return_to_start()
+        engine.show_name_entry()
+        engine.player_name = player_name
+        engine.start_countdown()
+        return engine.state == "countdown"
+
+
+class RackManager:
+    def __init__(self, configs, score_store, workers=None):
+        self.configs = configs
+        self.racks = {config.name: Rack(config, score_store) for config in configs}
+        self.workers = workers or min(len(configs), os.cpu_count() or 1)
+        # Spawn rather than fork: the parent already runs the logging and database threads
+        self.context = multiprocessing.get_context("spawn")
+        self.hits = self.context.Queue()
+        self.stop_event = self.context.Event()
+        self.processes = []
+
+    def start(self):
+        for i, group in enumerate(shard(self.configs, self.workers)):
+            process = self.context.Process(target=run_worker, args=(group, self.hits, self.stop_event),
+                                           name=f"rack-worker-{i}", daemon=True)
+            process.start()
+            self.processes.append(process)
+            logger.info("Worker %d runs racks %s", i, ", ".join(rack.name for rack in group))
+
+    def tick(self):
+        """Advance every rack's engine to now and score the hits the workers sent"""
+        now = time.time()
+        for rack in self.racks.values():
+            rack.engine.tick(now - rack.engine.now)
+        while True:
+            try:
+                name, cup_number, timestamp = self.hits.get_nowait()
+            except queue.Empty:
+                break
+            rack = self.racks.get(name)
+            if rack and rack.engine.state == "playing":
+                points = rack.engine.hit(cup_number, timestamp)
+                logger.info("Rack %s, cup %d: +%d points", name, cup_number, points)
+
+    def alive(self):
+        return all(process.is_alive() for process in self.processes)
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+
+
+def read_commands(commands):
+    """Put the (rack name, player name) lines typed on stdin on a queue"""
+    for line in sys.stdin:
+        name, _, player_name = line.strip().partition(" ")
+        commands.put((name, player_name.strip()))
+
+
+def main(path):
+    setup_logging()
+    configs, workers = load_racks(path)
+    score_store = ScoreStore('beer_pong_scores.db')
+    manager = RackManager(configs, score_store, workers)
+    manager.start()
+    commands = queue.Queue()
+    threading.Thread(target=read_commands, args=(commands,), daemon=True).start()
+    print("Type '<rack> <player name>' to start a game")
+    try:
+        while manager.alive():
+            manager.tick()
+            while not commands.empty():
+                name, player_name = commands.get()
+                rack = manager.racks.get(name)
+                if rack is None or not player_name:
+                    print(f"Usage: <rack> <player name>, racks: {', '.join(manager.racks)}")
+                elif not rack.start_game(player_name):
+                    print(f"Rack {name} is still playing")
+            for rack in manager.racks.values():
+                if rack.engine.state == "game_over":
+                    logger.info("Rack %s: game over, %s scored %d points",
+                                rack.name, rack.engine.player_name, rack.engine.score)
+                    rack.engine.return_to_start()
+            time.sleep(0.01)
+        logger.error("A rack worker exited")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+        score_store.close()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "racks.json")
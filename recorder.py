@@ -0,0 +1,280 @@
+"""Recordings of what the sensors saw, for settling disputed scores and for replay.
+
+SensorRecorder appends fixed-width binary records to a memory-mapped file: every
+raw reading (as an echo time of flight), every hit, and the baselines and
+thresholds the detection used. Each record is written straight into the map
+and the record count in the header is bumped afterwards, so a crash loses at
+most the record being written. Reopening a recording appends to it.
+
+load_recording() reads a file into typed arrays, one per field, and
+replay_recording() feeds it back through SensorSystem's detection logic into a
+hit_cup(cup_number, timestamp) function, as fast as it can. The same files make
+realistic benchmark input (benchmark.py --recording).
+
+    python recorder.py game.rec                      # summary, and the replayed score
+    python recorder.py game.rec --config pycup.toml  # replay with these filter settings
+"""
+import argparse
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+
+from baseline import BaselineTracker
+from fake_gpiod import FakeChip
+from sensor_controller import SPEED_OF_SOUND, SensorSystem
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PYCUPREC"
+VERSION = 1
+HEADER = struct.Struct("<8sHH4xQd")  # magic, version, record size, record count, start time
+RECORD = struct.Struct("<BB6xddd")  # kind, sensor id, time, value, extra
+GROW_RECORDS = 4096  # the file grows by this many records at a time
+
+# Record kinds, and what their value and extra fields hold
+SAMPLE = 1  # a reading: time of flight in seconds (NaN without an echo) and the time of the echo
+HIT = 2  # a hit: the filtered distance and the baseline, in cm
+BASELINE = 3  # a sensor's baseline and spread, in cm, as detection starts
+SETTINGS = 4  # hit_threshold and debounce_time, whenever they change
+KIND_NAMES = {SAMPLE: "sample", HIT: "hit", BASELINE: "baseline", SETTINGS: "settings"}
+
+
+class SensorRecorder:
+    def __init__(self, path, start_time=0.0):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a+b")
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell() >= HEADER.size:
+            self.file.seek(0)
+            magic, version, record_size, self.count, self.start_time = HEADER.unpack(self.file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+                self.file.close()
+                raise ValueError(f"{path} is not a pycup recording")
+        else:
+            self.file.truncate(0)
+            self.count = 0
+            self.start_time = start_time
+        self.map = None
+        self.capacity = 0
+        self.grow(self.count + GROW_RECORDS)
+        self.write_header()
+        logger.info("Recording sensors to %s (%d records so far)", path, self.count)
+
+    def grow(self, capacity):
+        if self.map is not None:
+            self.map.close()
+        self.file.truncate(HEADER.size + capacity * RECORD.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.capacity = capacity
+
+    def write_header(self):
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, RECORD.size, self.count, self.start_time)
+
+    def append(self, kind, sensor_id, timestamp, value, extra=0.0):
+        with self.lock:
+            if self.map is None:
+                return  # Closed
+            if self.count == self.capacity:
+                self.grow(self.capacity + GROW_RECORDS)
+            RECORD.pack_into(self.map, HEADER.size + self.count * RECORD.size,
+                             kind, sensor_id, timestamp, value, extra)
+            self.count += 1
+            self.write_header()
+
+    def sample(self, sensor_id, timestamp, distance, echo_time):
+        """A reading processed at timestamp; distance and echo_time are None without an echo"""
+        if distance is None:
+            self.append(SAMPLE, sensor_id, timestamp, math.nan, math.nan)
+        else:
+            self.append(SAMPLE, sensor_id, timestamp, distance * 2 / SPEED_OF_SOUND, echo_time)
+
+    def hit(self, sensor_id, timestamp, distance, baseline):
+        self.append(HIT, sensor_id, timestamp, distance, baseline)
+
+    def baseline(self, sensor_id, timestamp, baseline, spread):
+        self.append(BASELINE, sensor_id, timestamp, baseline, spread)
+
+    def settings(self, timestamp, hit_threshold, debounce_time):
+        self.append(SETTINGS, 0, timestamp, hit_threshold, debounce_time)
+
+    def close(self):
+        with self.lock:
+            if self.map is None:
+                return
+            self.map.flush()
+            self.map.close()
+            self.map = None
+            # Drop the unused tail, so the file ends with its last record
+            self.file.truncate(HEADER.size + self.count * RECORD.size)
+            self.file.close()
+        logger.info("Recording %s closed: %d records", self.path, self.count)
+
+
+class Recording:
+    """The records of a file, one typed array per field"""
+
+    def __init__(self, start_time=0.0):
+        self.start_time = start_time
+        self.kinds = array("B")
+        self.sensor_ids = array("B")
+        self.times = array("d")
+        self.values = array("d")
+        self.extras = array("d")
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def count(self, kind):
+        return self.kinds.count(kind)
+
+    def sensor_count(self):
+        return max(self.sensor_ids, default=-1) + 1
+
+
+def load_recording(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a pycup recording")
+    magic, version, record_size, count, start_time = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a pycup recording")
+    recording = Recording(start_time)
+    end = HEADER.size + count * RECORD.size
+    for kind, sensor_id, timestamp, value, extra in RECORD.iter_unpack(data[HEADER.size:end]):
+        recording.kinds.append(kind)
+        recording.sensor_ids.append(sensor_id)
+        recording.times.append(timestamp)
+        recording.values.append(value)
+        recording.extras.append(extra)
+    return recording
+
+
+class ReplayClock:
+    """Clock that stands still at the time of the record being replayed"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def monotonic_ns(self):
+        return int(self.now * 1e9)
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ReplayBackend:
+    """gpio_backend-style backend for a SensorSystem that is only fed recorded readings"""
+
+    def __init__(self, now=0.0):
+        self.clock = ReplayClock(now)
+
+    def open_chip(self):
+        return FakeChip("replay", clock=self.clock)
+
+    def connect_sensor(self, chip, trigger_pin, echo_pin):
+        pass
+
+
+class ReplayResult:
+    def __init__(self):
+        self.samples = 0
+        self.recorded_hits = []  # (sensor id, timestamp)
+        self.replayed_hits = []
+
+    def matches(self, tolerance=0.001):
+        """True if the replay found the recorded hits, at the recorded times"""
+        return len(self.recorded_hits) == len(self.replayed_hits) and all(
+            a[0] == b[0] and abs(a[1] - b[1]) <= tolerance
+            for a, b in zip(self.recorded_hits, self.replayed_hits))
+
+
+def replay_recording(recording, hit_cup, filter_method=None, filter_window=3):
+    """
+    Feed a recording through the hit detection, calling hit_cup(cup_number,
+    timestamp) for every hit it finds. filter_method and filter_window must
+    match the recorded run for the hits to come out the same.
+    """
+    backend = ReplayBackend(recording.start_time)
+    clock = backend.clock
+    system = SensorSystem(backend=backend, filter_method=filter_method, filter_window=filter_window,
+                          baseline_file=os.devnull,
+                          sensor_pins=[{"trigger": 2 * i, "echo": 2 * i + 1}
+                                       for i in range(recording.sensor_count())])
+    system.baseline_save_interval = math.inf  # Never write the replayed baselines anywhere
+    system.setup_sensors()
+    sensors = system.sensors
+    result = ReplayResult()
+
+    def on_hit(sensor_id, timestamp):
+        result.replayed_hits.append((sensor_id, timestamp))
+        hit_cup(sensor_id, timestamp)
+
+    system.set_hit_callback(on_hit)
+    for kind, sensor_id, timestamp, value, extra in zip(recording.kinds, recording.sensor_ids, recording.times,
+                                                        recording.values, recording.extras):
+        clock.now = timestamp
+        if kind == SAMPLE:
+            sensor = sensors[sensor_id]
+            sensor.last_reading_time = extra
+            system.process_reading(sensor, None if math.isnan(value) else value * SPEED_OF_SOUND / 2)
+            result.samples += 1
+        elif kind == HIT:
+            result.recorded_hits.append((sensor_id, timestamp))
+        elif kind == BASELINE:
+            sensors[sensor_id].baseline = value
+            sensors[sensor_id].baseline_tracker = BaselineTracker(value, extra)
+        elif kind == SETTINGS:
+            system.hit_threshold = value
+            system.debounce_time = extra
+    for sensor in sensors:
+        sensor.cleanup()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="file written by SensorRecorder")
+    parser.add_argument("--config", help="settings file with the filter settings of the recorded run")
+    args = parser.parse_args()
+
+    from game_engine import GameEngine
+    sensors = None
+    if args.config:
+        from config import load_config
+        sensors = load_config(args.config).sensors
+    recording = load_recording(args.recording)
+    print(f"{args.recording}: {len(recording)} records from {recording.sensor_count()} sensors")
+    for kind, name in KIND_NAMES.items():
+        print(f"  {name:10} {recording.count(kind)}")
+
+    engine = GameEngine(num_cups=max(10, recording.sensor_count()), now=recording.start_time)
+    if sensors is None:
+        result = replay_recording(recording, engine.hit)
+    else:
+        result = replay_recording(recording, engine.hit,
+                                  None if sensors.filter_method == "none" else sensors.filter_method,
+                                  sensors.filter_window)
+    print(f"Replayed {result.samples} samples: {len(result.replayed_hits)} hits "
+          f"({len(result.recorded_hits)} recorded), {engine.score} points")
+    for sensor_id, timestamp in result.replayed_hits:
+        print(f"  cup {sensor_id} at {timestamp - recording.start_time:9.3f} s")
+    if not result.matches():
+        print("The replayed hits differ from the recorded ones; were the filter settings the same?")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
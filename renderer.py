@@ -0,0 +1,100 @@
+import time
+import pygame
+
+
+class DirtyRenderer:
+    """
+    Redraws only the parts of the screen that changed.
+    Every screen is a static layer, drawn once when the screen is entered, plus
+    named regions that are redrawn only when their key changes, plus groups of
+    sprites of which only the changed ones are redrawn. Changed areas
+    are pushed with pygame.display.update(rects) instead of flipping the whole
+    display, and frame_rate() drops to idle_fps while nothing is changing,
+    unless the caller says the screen is live (a game is running).
+    Regions are cleared by restoring the static layer, so they must not overlap.
+    """
+
+    def __init__(self, screen, fps=60, idle_fps=10, idle_after=0.5):
+        self.screen = screen
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after  # seconds without changes before going idle
+        self.scene = None
+        self.background = None
+        self.regions = {}  # name -> (key, rect drawn last time)
+        self.sprite_groups = {}  # name -> (keys, rects drawn last time)
+        self.dirty = []
+        self.full_update = True
+        self.last_change = time.monotonic()
+
+    def set_scene(self, scene, draw_static):
+        """Enter a screen; draw_static(surface) is only called when the screen changes"""
+        if scene == self.scene:
+            return
+        self.scene = scene
+        self.regions = {}
+        self.sprite_groups = {}
+        draw_static(self.screen)
+        self.background = self.screen.copy()
+        self.full_update = True
+
+    def invalidate(self):
+        """Redraw everything on the next frame"""
+        self.scene = None
+
+    def region(self, name, key, draw, *args):
+        """Redraw a region with draw(surface, *args) -> Rect if key differs from last frame"""
+        previous = self.regions.get(name)
+        if previous is not None and previous[0] == key:
+            return
+        if previous is not None and previous[1]:
+            # Restore the static layer under what was drawn before
+            self.screen.blit(self.background, previous[1], previous[1])
+            self.dirty.append(previous[1])
+        rect = draw(self.screen, *args)
+        if rect:
+            self.dirty.append(rect)
+        self.regions[name] = (key, rect)
+
+    def sprites(self, name, keys, sprite):
+        """
+        Redraw the sprites of a group whose key differs from last frame, all in
+        one Surface.blits call. keys holds one key per sprite, and sprite(i)
+        returns the (surface, position) of sprite i; it is only called for
+        sprites that changed.
+        """
+        old_keys, old_rects = self.sprite_groups.get(name, ((), ()))
+        changed = [i for i, key in enumerate(keys) if i >= len(old_keys) or old_keys[i] != key]
+        if not changed:
+            return
+        # Restore the static layer under the old sprites first, in the same batch
+        restore = [(self.background, old_rects[i], old_rects[i]) for i in changed if i < len(old_rects)]
+        rects = self.screen.blits(restore + [sprite(i) for i in changed])
+        new_rects = (list(old_rects) + [None] * len(keys))[:len(keys)]
+        for i, rect in zip(changed, rects[len(restore):]):
+            new_rects[i] = rect
+        self.dirty.extend(rects)
+        self.sprite_groups[name] = (list(keys), new_rects)
+
+    def present(self):
+        """Push this frame's changes to the display; returns False if nothing changed"""
+        if self.full_update:
+            pygame.display.flip()
+        elif self.dirty:
+            pygame.display.update(self.dirty)
+        else:
+            return False
+        self.full_update = False
+        self.dirty = []
+        self.last_change = time.monotonic()
+        return True
+
+    def frame_rate(self, active=False):
+        """
+        Frame cap for the next frame. While active, e.g. during a game, it stays
+        at fps however long the screen is unchanged: the loop also collects
+        input and sensor hits, which would otherwise wait up to a whole idle frame.
+        """
+        if active or time.monotonic() - self.last_change < self.idle_after:
+            return self.fps
+        return self.idle_fps
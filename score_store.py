@@ -0,0 +1,89 @@
+import logging
+import queue
+import sqlite3
+from threading import Lock, Thread
+
+logger = logging.getLogger(__name__)
+
+
+class ScoreStore:
+    """
+    The high_scores table behind one long-lived SQLite connection in WAL mode.
+    save() only queues the score; a background writer inserts whatever has been
+    queued as one batch per transaction, so the game loop never waits on disk.
+    Scores are partitioned by rack (table) name; a single-table game uses ''.
+    """
+
+    def __init__(self, path='beer_pong_scores.db', batch_size=64):
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = Lock()  # the game thread reads while the writer thread inserts
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            # With WAL this only risks the last commits on power loss, never corruption
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS high_scores (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    player_name TEXT NOT NULL,
+                    score INTEGER NOT NULL,
+                    date_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    rack TEXT NOT NULL DEFAULT ''
+                )
+            ''')
+            columns = [row[1] for row in self.conn.execute('PRAGMA table_info(high_scores)')]
+            if 'rack' not in columns:  # Database from before racks existed
+                self.conn.execute("ALTER TABLE high_scores ADD COLUMN rack TEXT NOT NULL DEFAULT ''")
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_high_scores_score ON high_scores (score DESC)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_high_scores_rack_score ON high_scores (rack, score DESC)')
+            self.conn.commit()
+        self.pending = queue.Queue()
+        self.writer = Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def save(self, player_name, score, rack=''):
+        self.pending.put((player_name, score, rack))
+
+    def top(self, limit=10, rack=None):
+        """Best scores of one rack, or of all racks if rack is None"""
+        with self.lock:
+            if rack is None:
+                cursor = self.conn.execute(
+                    'SELECT player_name, score, date_time FROM high_scores ORDER BY score DESC LIMIT ?', (limit,))
+            else:
+                cursor = self.conn.execute(
+                    'SELECT player_name, score, date_time FROM high_scores WHERE rack = ? ORDER BY score DESC LIMIT ?',
+                    (rack, limit))
+            return cursor.fetchall()
+
+    def write_loop(self):
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            if rows:
+                try:
+                    with self.lock:
+                        self.conn.executemany('INSERT INTO high_scores (player_name, score, rack) VALUES (?, ?, ?)', rows)
+                        self.conn.commit()
+                except sqlite3.Error as e:
+                    logger.error("Failed to save %d scores: %s", len(rows), e)
+            for _ in batch:
+                self.pending.task_done()
+            if None in batch:
+                return
+
+    def flush(self):
+        """Wait until every queued score is written"""
+        self.pending.join()
+
+    def close(self):
+        if self.writer.is_alive():
+            self.pending.put(None)
+            self.writer.join()
+        with self.lock:
+            self.conn.close()
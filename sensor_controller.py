@@ -1,90 +1,219 @@
-import gpiod
+try:
+    import gpiod
+except ImportError:  # Not on a Pi; only fake_gpiod chips will work
+    import fake_gpiod as gpiod
+import logging
 import time
 import statistics
 from threading import Thread, Lock
 from datetime import datetime
+from sensor_scheduler import SensorScheduler
+from gpio_backend import default_backend
+from distance_filter import DistanceFilter
+from baseline import BaselineStore, BaselineTracker
+from metrics import SensorMetrics, SystemMetrics
+
+logger = logging.getLogger(__name__)
+
+SPEED_OF_SOUND = 34300  # cm/s
 
 class UltrasonicSensor:
-    def __init__(self, chip, trigger_pin, echo_pin, sensor_id):
+    def __init__(self, chip, trigger_pin, echo_pin, sensor_id, use_edge_events=False, clock=time):
         self.chip = chip
+        self.clock = clock
         self.trigger_pin = trigger_pin
         self.echo_pin = echo_pin
         self.sensor_id = sensor_id
+        self.use_edge_events = use_edge_events
         self.baseline = None
+        self.baseline_tracker = None
         self.trigger_line = None
         self.echo_line = None
         self.last_trigger_time = 0
+        self.last_reading_time = None  # wall-clock time the last echo ended
+        self.metrics = SensorMetrics()
         self.setup_gpio()
 
     def setup_gpio(self):
         self.trigger_line = self.chip.get_line(self.trigger_pin)
         self.echo_line = self.chip.get_line(self.echo_pin)
         self.trigger_line.request(consumer=f"sensor_{self.sensor_id}_trigger", type=gpiod.LINE_REQ_DIR_OUT)
-        self.echo_line.request(consumer=f"sensor_{self.sensor_id}_echo", type=gpiod.LINE_REQ_DIR_IN)
+        echo_type = gpiod.LINE_REQ_EV_BOTH_EDGES if self.use_edge_events else gpiod.LINE_REQ_DIR_IN
+        self.echo_line.request(consumer=f"sensor_{self.sensor_id}_echo", type=echo_type)
 
-    def measure_distance(self):
+    def trigger(self):
         self.trigger_line.set_value(1)
-        time.sleep(0.00001)
+        self.clock.sleep(0.00001)
         self.trigger_line.set_value(0)
 
-        start_time = time.time()
-        stop_time = time.time()
+    def measure_distance(self, timeout=0.1):
+        if self.use_edge_events:
+            distance = self.measure_distance_edges(timeout)
+        else:
+            distance = self.measure_distance_polling(timeout)
+        self.metrics.record_ping(None if distance is None else distance * 2 / SPEED_OF_SOUND)
+        return distance
 
-        while self.echo_line.get_value() == 0 and time.time() - start_time < 0.1:
-            start_time = time.time()
+    def measure_distance_polling(self, timeout=0.1):
+        """Time the echo pulse by polling the line; returns None if it does not end in time"""
+        self.trigger()
 
-        while self.echo_line.get_value() == 1 and time.time() - start_time < 0.1:
-            stop_time = time.time()
+        deadline = self.clock.monotonic() + timeout
+        while self.echo_line.get_value() == 0:
+            if self.clock.monotonic() >= deadline:
+                return None
+        start_time = self.clock.monotonic()
+
+        while self.echo_line.get_value() == 1:
+            if self.clock.monotonic() >= deadline:
+                return None  # Cut off; the width would be too short
+        stop_time = self.clock.monotonic()
 
         time_elapsed = stop_time - start_time
-        distance = (time_elapsed * 34300) / 2
+        distance = (time_elapsed * SPEED_OF_SOUND) / 2
+        self.last_reading_time = self.clock.time()
         return distance
 
+    def measure_distance_edges(self, timeout=0.1):
+        """
+        Time the echo pulse from kernel-timestamped edge events.
+        The thread sleeps in event_wait() instead of spinning on get_value(), and
+        the pulse width comes from the kernel timestamps, so scheduling delays in
+        Python do not skew the distance. Returns None if no echo arrives in time.
+        """
+        # Drop edges left over from an earlier ping that timed out
+        while self.echo_line.event_wait(sec=0, nsec=0):
+            self.echo_line.event_read()
+
+        self.trigger()
+
+        deadline = self.clock.monotonic() + timeout
+        rising_ns = None
+        while True:
+            remaining = deadline - self.clock.monotonic()
+            if remaining <= 0:
+                return None
+            if not self.echo_line.event_wait(sec=int(remaining), nsec=int(remaining % 1 * 1e9)):
+                return None
+            event = self.echo_line.event_read()
+            timestamp_ns = event.sec * 1_000_000_000 + event.nsec
+            if event.type == gpiod.LineEvent.RISING_EDGE:
+                rising_ns = timestamp_ns
+            elif rising_ns is not None:
+                return self.pulse_distance(rising_ns, timestamp_ns)
+
+    def pulse_distance(self, rising_ns, falling_ns):
+        """Distance for an echo pulse between two kernel edge timestamps"""
+        time_elapsed = (falling_ns - rising_ns) / 1e9
+        # Kernel timestamps are CLOCK_MONOTONIC; convert to wall-clock time
+        self.last_reading_time = self.clock.time() - (self.clock.monotonic_ns() - falling_ns) / 1e9
+        return (time_elapsed * SPEED_OF_SOUND) / 2
+
     def calibrate(self, num_measurements=10):
         measurements = []
         for _ in range(num_measurements):
             dist = self.measure_distance()
-            measurements.append(dist)
-            time.sleep(0.1)
-        
-        self.baseline = statistics.median(measurements)
-        print(f"Sensor {self.sensor_id} baseline: {self.baseline:.2f} cm")
+            if dist is not None:
+                measurements.append(dist)
+            self.clock.sleep(0.1)
+
+        if not measurements:
+            # Leave the sensor uncalibrated, so it never reports hits
+            logger.warning("Sensor %d got no echoes (%d pings), not calibrated", self.sensor_id, num_measurements)
+            return self.baseline
+        self.apply_calibration(measurements)
+        logger.info("Sensor %d baseline: %.2f cm", self.sensor_id, self.baseline)
         return self.baseline
 
+    def apply_calibration(self, measurements):
+        """Set the baseline from calibration readings"""
+        self.baseline = statistics.median(measurements)
+        spread = statistics.median(abs(m - self.baseline) for m in measurements)
+        self.baseline_tracker = BaselineTracker(self.baseline, spread)
+
+    def restore_baseline(self, stored, readings):
+        """
+        Reuse a baseline saved by an earlier run instead of calibrating.
+        readings are fresh pings to check it against (None for a missed echo);
+        returns False if any is missing or off by 10%, e.g. because the cup has moved.
+        """
+        if not readings or any(dist is None or abs(dist - stored["baseline"]) > stored["baseline"] * 0.10
+                               for dist in readings):
+            return False
+        self.baseline_tracker = BaselineTracker(stored["baseline"], stored["spread"])
+        self.baseline = stored["baseline"]
+        return True
+
     def cleanup(self):
         if self.trigger_line:
             self.trigger_line.release()
         if self.echo_line:
             self.echo_line.release()
 
+# Pin mappings for 10 sensors, used unless SensorSystem is given its own
+SENSOR_PINS = [
+    {"trigger": 23, "echo": 24},  # Sensor 0
+    # {"trigger": 17, "echo": 27},  # Sensor 1
+    # {"trigger": 22, "echo": 10},  # Sensor 2
+    # {"trigger": 9, "echo": 11},   # Sensor 3
+    # {"trigger": 5, "echo": 6},    # Sensor 4
+    # {"trigger": 13, "echo": 19},  # Sensor 5
+    # {"trigger": 26, "echo": 21},  # Sensor 6
+    # {"trigger": 20, "echo": 16},  # Sensor 7
+    # {"trigger": 12, "echo": 7},   # Sensor 8
+    # {"trigger": 8, "echo": 25},   # Sensor 9
+]
+
+
 class SensorSystem:
-    def __init__(self):
-        # Define pin mappings for 10 sensors
-        self.sensor_pins = [
-            {"trigger": 23, "echo": 24},  # Sensor 0
-            # {"trigger": 17, "echo": 27},  # Sensor 1
-            # {"trigger": 22, "echo": 10},  # Sensor 2
-            # {"trigger": 9, "echo": 11},   # Sensor 3
-            # {"trigger": 5, "echo": 6},    # Sensor 4
-            # {"trigger": 13, "echo": 19},  # Sensor 5
-            # {"trigger": 26, "echo": 21},  # Sensor 6
-            # {"trigger": 20, "echo": 16},  # Sensor 7
-            # {"trigger": 12, "echo": 7},   # Sensor 8
-            # {"trigger": 8, "echo": 25},   # Sensor 9
-        ]
-        self.chip = gpiod.Chip('4')  # For Raspberry Pi 5
+    def __init__(self, use_edge_events=True, slot_time=0.03, backend=None,
+                 filter_method=None, filter_window=3, baseline_file='sensor_baselines.json',
+                 sensor_pins=None):
+        self.sensor_pins = list(SENSOR_PINS if sensor_pins is None else sensor_pins)
+        self.backend = backend or default_backend()
+        self.clock = self.backend.clock
+        self.chip = self.backend.open_chip()
         self.sensors = []
         self.running = False
         self.threads = []
         self.lock = Lock()
         self.debounce_time = 1.0  # Debounce time in seconds
+        self.hit_threshold = 0.10  # A hit differs from the baseline by this fraction of it
+        self.ping_timeout = 0.1  # Seconds check_sensor waits for an echo when not given a timeout
         self.hit_callback = None
-        print("SensorSystem initialized")
+        self.use_edge_events = use_edge_events
+        self.scheduler = SensorScheduler(self, slot_time)
+        self.filter_method = filter_method  # None to act on raw readings
+        self.filter_window = filter_window
+        self.distance_filter = None
+        self.baseline_store = BaselineStore(baseline_file)
+        self.baseline_save_interval = 300  # seconds
+        self.calibration_report = {}
+        self.metrics = SystemMetrics(self.sensors)
+        self.recorder = None  # recorder.SensorRecorder, if readings are being recorded
+        logger.info("SensorSystem initialized")
 
     def set_hit_callback(self, callback):
-        """Set the callback function to be called when a sensor is triggered"""
+        """
+        Set the callback function to be called when a sensor is triggered.
+        It is called as callback(sensor_id, timestamp) from the monitoring thread,
+        timestamp being the wall-clock time of the echo that detected the ball.
+        """
         self.hit_callback = callback
-        print("Callback function set")
+        logger.info("Callback function set")
+
+    def set_recorder(self, recorder):
+        """
+        Record every reading and hit to a recorder.SensorRecorder, starting with
+        the current baselines and thresholds so the recording replays on its own.
+        Call it after calibration; stop_monitoring closes the recorder.
+        """
+        now = self.clock.time()
+        recorder.settings(now, self.hit_threshold, self.debounce_time)
+        for sensor in self.sensors:
+            if sensor.baseline_tracker is not None:
+                recorder.baseline(sensor.sensor_id, now, sensor.baseline, sensor.baseline_tracker.spread)
+        self.recorder = recorder
 
     def setup_sensors(self):
         for i, pins in enumerate(self.sensor_pins):
@@ -92,69 +221,197 @@ class SensorSystem:
                 self.chip,
                 pins["trigger"],
                 pins["echo"],
-                i
+                i,
+                use_edge_events=self.use_edge_events,
+                clock=self.clock
             )
+            self.backend.connect_sensor(self.chip, pins["trigger"], pins["echo"])
             self.sensors.append(sensor)
-        print(f"Setup completed for {len(self.sensors)} sensors")
+        if self.filter_method:
+            self.distance_filter = DistanceFilter(len(self.sensors), self.filter_method, self.filter_window)
+        logger.info("Setup completed for %d sensors", len(self.sensors))
+
+    def calibrate_all_sensors(self, num_measurements=5, check_pings=2):
+        """
+        Calibrate all sensors together. Pings are interleaved across the sensors
+        on the scheduler's slot grid, so they never overlap and every baseline
+        is ready in about the time one sensor used to take. Sensors with a
+        stored baseline first get check_pings pings; if all of them agree with
+        it, the sensor is done. The others get num_measurements pings. Every
+        sensor gets an entry in calibration_report, and ones with noisy or
+        missing echoes are flagged.
+        """
+        logger.info("Starting sensor calibration...")
+        self.calibration_report = {}
+        stored = {sensor.sensor_id: self.baseline_store.get(sensor) for sensor in self.sensors}
+        checks = {sensor.sensor_id: [] for sensor in self.sensors if stored[sensor.sensor_id] is not None}
+        for sensor, dist in self.scheduler.interleave([s for s in self.sensors if s.sensor_id in checks],
+                                                      check_pings):
+            checks[sensor.sensor_id].append(dist)
 
-    def calibrate_all_sensors(self):
-        print("Starting sensor calibration...")
+        pending = []
         for sensor in self.sensors:
-            sensor.calibrate()
-        print("Calibration complete!")
-
-    def monitor_sensor(self, sensor):
-        print(f"Started monitoring thread for sensor {sensor.sensor_id}")
-        while self.running:
-            try:
-                current_distance = sensor.measure_distance()
-                threshold = sensor.baseline * 0.10  # 10% threshold
-                current_time = time.time()
-
-                # Add distance debugging every few seconds
-                if sensor.sensor_id == 0 and int(current_time) % 5 == 0:
-                    print(f"Sensor 0 distance: {current_distance:.2f} cm (baseline: {sensor.baseline:.2f} cm)")
-
-                if (abs(current_distance - sensor.baseline) > threshold and 
-                    current_time - sensor.last_trigger_time > self.debounce_time):
-                    with self.lock:
-                        print(f"Motion detected on sensor {sensor.sensor_id}!")
-                        print(f"Distance: {current_distance:.2f} cm (baseline: {sensor.baseline:.2f} cm)")
-                        if self.hit_callback:
-                            print(f"Calling hit callback for sensor {sensor.sensor_id}")
-                            self.hit_callback(sensor.sensor_id)
-                        else:
-                            print("Warning: No callback function set!")
-                        sensor.last_trigger_time = current_time
-            except Exception as e:
-                print(f"Error in sensor {sensor.sensor_id} monitoring: {e}")
-            
-            time.sleep(0.1)
-        
-        print(f"Stopped monitoring thread for sensor {sensor.sensor_id}")
+            readings = checks.get(sensor.sensor_id)
+            if readings is not None and sensor.restore_baseline(stored[sensor.sensor_id], readings):
+                self.report_calibration(sensor, readings, check_pings, restored=True)
+            else:
+                pending.append(sensor)
+
+        measurements = {sensor.sensor_id: [] for sensor in pending}
+        for sensor, dist in self.scheduler.interleave(pending, num_measurements):
+            if dist is not None:
+                measurements[sensor.sensor_id].append(dist)
+        for sensor in pending:
+            readings = measurements[sensor.sensor_id]
+            if readings:
+                sensor.apply_calibration(readings)
+            self.report_calibration(sensor, readings, num_measurements, restored=False)
+
+        self.save_baselines()
+        logger.info("Calibration complete!")
+        return self.calibration_report
+
+    def report_calibration(self, sensor, readings, pings, restored):
+        """Add a sensor's entry to calibration_report, flagging it if it looks faulty"""
+        if self.distance_filter is not None:
+            self.distance_filter.reset(sensor.sensor_id)  # Forget readings from the old baseline
+        readings = [dist for dist in readings if dist is not None]
+        report = {
+            "baseline": None,
+            "stdev": None,
+            "missed": pings - len(readings),
+            "ok": False,
+            "restored": restored,
+        }
+        if readings and sensor.baseline is not None:
+            report["baseline"] = sensor.baseline
+            report["stdev"] = statistics.pstdev(readings)
+            # Most pings answered and readings within 5% of each other
+            report["ok"] = (report["missed"] <= pings // 2 and
+                            report["stdev"] <= sensor.baseline * 0.05)
+            logger.info("Sensor %d baseline: %.2f cm (%s, stdev %.2f cm, %d missed)",
+                        sensor.sensor_id, sensor.baseline, "restored" if restored else "measured",
+                        report["stdev"], report["missed"])
+        if not report["ok"]:
+            logger.warning("Sensor %d looks faulty (%d/%d echoes)", sensor.sensor_id, len(readings), pings)
+        self.calibration_report[sensor.sensor_id] = report
+
+    def save_baselines(self):
+        for sensor in self.sensors:
+            if sensor.baseline_tracker is not None:
+                self.baseline_store.put(sensor, sensor.baseline_tracker)
+        self.baseline_store.save()
+
+    def track_baseline(self, sensor, distance, is_hit_candidate, current_time):
+        """Follow slow drift of the resting distance using readings without a ball"""
+        tracker = sensor.baseline_tracker
+        if tracker is None:
+            return
+        if not is_hit_candidate:
+            tracker.update(distance)
+        elif tracker.shifted(distance, current_time):
+            logger.info("Sensor %d baseline relearned: %.2f cm", sensor.sensor_id, tracker.baseline)
+        sensor.baseline = tracker.baseline
+        if current_time - self.baseline_store.saved_at > self.baseline_save_interval:
+            self.save_baselines()
+
+    def check_sensor(self, sensor, timeout=None):
+        """Take one reading from a sensor and fire the hit callback if it detects a ball"""
+        if timeout is None:
+            timeout = self.ping_timeout
+        try:
+            self.process_reading(sensor, sensor.measure_distance(timeout))
+        except Exception as e:
+            logger.error("Error in sensor %d monitoring: %s", sensor.sensor_id, e)
+
+    def process_reading(self, sensor, current_distance):
+        """Filter a reading, fire the hit callback if it shows a ball and follow the baseline"""
+        current_time = self.clock.time()
+        if self.recorder is not None:
+            self.recorder.sample(sensor.sensor_id, current_time, current_distance, sensor.last_reading_time)
+        if current_distance is None or sensor.baseline is None:
+            # No echo within the timeout, or never calibrated: nothing to compare
+            return
+        threshold = sensor.baseline * self.hit_threshold
+        raw_distance = current_distance
+        if self.distance_filter is not None:
+            # A single stray echo no longer triggers a hit on its own
+            current_distance = self.distance_filter.filter(sensor.sensor_id, current_distance, sensor.baseline)
+
+        # Add distance debugging every few seconds
+        if sensor.sensor_id == 0 and int(current_time) % 5 == 0:
+            logger.debug("Sensor 0 distance: %.2f cm (baseline: %.2f cm)", current_distance, sensor.baseline)
+
+        # The raw reading must show the ball too, or a filter still holding on
+        # to it after it left would score it again once the debounce is over
+        is_hit_candidate = (abs(current_distance - sensor.baseline) > threshold
+                            and abs(raw_distance - sensor.baseline) > threshold)
+        if (is_hit_candidate and 
+            current_time - sensor.last_trigger_time > self.debounce_time):
+            with self.lock:
+                logger.info("Motion detected on sensor %d! Distance: %.2f cm (baseline: %.2f cm)",
+                            sensor.sensor_id, current_distance, sensor.baseline)
+                sensor.metrics.hits += 1
+                if self.recorder is not None:
+                    self.recorder.hit(sensor.sensor_id, sensor.last_reading_time, current_distance, sensor.baseline)
+                if self.hit_callback:
+                    logger.debug("Calling hit callback for sensor %d", sensor.sensor_id)
+                    self.metrics.detection_latency.observe(self.clock.time() - sensor.last_reading_time)
+                    callback_start = time.perf_counter()
+                    self.hit_callback(sensor.sensor_id, sensor.last_reading_time)
+                    self.metrics.callback_duration.observe(time.perf_counter() - callback_start)
+                else:
+                    logger.warning("No callback function set!")
+                sensor.last_trigger_time = current_time
+        self.track_baseline(sensor, float(current_distance), is_hit_candidate, current_time)
+
+    def set_ping_rate(self, ping_rate):
+        """Set the aggregate number of pings per second across all sensors"""
+        self.scheduler.ping_rate = ping_rate
+        logger.info("Ping rate set to %.1f/s (%.1f/s per sensor)",
+                    self.scheduler.ping_rate, self.scheduler.per_sensor_rate)
+
+    def apply_config(self, config):
+        """
+        Take over the thresholds and rates of a config.Config. Only plain
+        attributes change, which the monitoring thread reads on every reading,
+        so this is safe to call while monitoring.
+        """
+        sensors = config.sensors
+        self.hit_threshold = sensors.hit_threshold
+        self.debounce_time = sensors.debounce_time
+        self.set_ping_rate(1 / config.scheduling.slot_time)
+        if self.recorder is not None:
+            self.recorder.settings(self.clock.time(), self.hit_threshold, self.debounce_time)
+        if sensors.pins is not None and sensors.pins != self.sensor_pins:
+            logger.warning("Sensor pins changed; restart to use them")
 
     def start_monitoring(self):
-        print("Starting sensor monitoring...")
+        logger.info("Starting sensor monitoring...")
         self.running = True
         self.threads = []
         
-        for sensor in self.sensors:
-            thread = Thread(target=self.monitor_sensor, args=(sensor,), daemon=True)
-            thread.start()
-            self.threads.append(thread)
-        print(f"Started {len(self.threads)} monitoring threads")
+        # One thread pings every sensor in turn, so echoes never overlap
+        thread = Thread(target=self.scheduler.run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        logger.info("Started scheduler for %d sensors (%.0f ms slots)",
+                    len(self.sensors), self.scheduler.slot_time * 1000)
 
     def stop_monitoring(self):
-        print("Stopping sensor monitoring...")
+        logger.info("Stopping sensor monitoring...")
         self.running = False
         for thread in self.threads:
             thread.join()
         
+        self.save_baselines()
         for sensor in self.sensors:
             sensor.cleanup()
         
         self.chip.close()
-        print("Sensor monitoring stopped and cleaned up")
+        if self.recorder is not None:
+            self.recorder.close()
+        logger.info("Sensor monitoring stopped and cleaned up")
 
     def is_running(self):
         """Check if the sensor system is running"""
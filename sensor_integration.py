@@ -1,26 +1,57 @@
 from sensor_controller import SensorSystem
+from gpio_backend import default_backend
+from logging_setup import setup_logging, shutdown_logging
+import logging
 import time
 
-def start_sensor_system():
-    """Initialize and start the sensor system"""
-    system = SensorSystem()
+logger = logging.getLogger(__name__)
+
+def start_sensor_system(backend=None, sensor_pins=None, baseline_file='sensor_baselines.json', config=None,
+                        monitor=True, progress=None):
+    """
+    Initialize and start the sensor system (on the real GPIO chip unless a backend is given).
+    With a config.Config, its sensor and scheduling settings replace the other arguments.
+    With monitor=False the sensors are set up and calibrated but not polled,
+    for callers that run them themselves (async_sensors.AsyncSensorRuntime).
+    progress(step), if given, is told which step the bring-up is at.
+    """
+    if progress is None:
+        progress = lambda step: None
+    if config is None:
+        system = SensorSystem(backend=backend, sensor_pins=sensor_pins, baseline_file=baseline_file)
+    else:
+        sensors = config.sensors
+        system = SensorSystem(use_edge_events=sensors.use_edge_events,
+                              slot_time=config.scheduling.slot_time,
+                              backend=backend or default_backend(sensors.chip),
+                              filter_method=None if sensors.filter_method == "none" else sensors.filter_method,
+                              filter_window=sensors.filter_window,
+                              baseline_file=sensors.baseline_file,
+                              sensor_pins=sensors.pins)
+        system.apply_config(config)
+    progress("setting up GPIO")
     system.setup_sensors()
+    progress("calibrating")
     system.calibrate_all_sensors()
+    if not monitor:
+        return system
+    progress("starting")
     system.start_monitoring()
     
     # Verify the system is running
     if system.is_running():
-        print("Sensor system is running and monitoring")
+        logger.info("Sensor system is running and monitoring")
     else:
-        print("Warning: Sensor system may not be running properly")
+        logger.warning("Sensor system may not be running properly")
     
     return system
 
 if __name__ == '__main__':
+    setup_logging()
     try:
         # Test function to print when a sensor is triggered
-        def test_hit(sensor_id):
-            print(f"Test hit on sensor {sensor_id}")
+        def test_hit(sensor_id, timestamp):
+            print(f"Test hit on sensor {sensor_id} at {timestamp:.3f}")
 
         system = start_sensor_system()
         system.set_hit_callback(test_hit)
@@ -36,4 +67,6 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         print("\nStopping monitoring...")
         system.stop_monitoring()
-        print("Cleanup complete")
\ No newline at end of file
+        print("Cleanup complete")
+    finally:
+        shutdown_logging()
\ No newline at end of file
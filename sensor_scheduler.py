@@ -0,0 +1,73 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# An HC-SR04 echo from its 4 m maximum range returns after ~23 ms, so slots
+# shorter than this let one sensor hear the tail of another sensor's ping.
+MIN_SLOT_TIME = 0.025
+
+
+class SensorScheduler:
+    """
+    Pings every sensor of a SensorSystem from a single loop.
+    Each sensor gets its own time slot and only one sensor is triggered per slot,
+    so pings never overlap (no acoustic crosstalk) and every sensor is read
+    exactly once per round, giving a fixed worst-case latency of one round.
+    """
+
+    def __init__(self, system, slot_time=0.03):
+        self.system = system
+        self.slot_time = max(MIN_SLOT_TIME, slot_time)
+
+    @property
+    def ping_rate(self):
+        """Aggregate pings per second across all sensors"""
+        return 1 / self.slot_time
+
+    @ping_rate.setter
+    def ping_rate(self, ping_rate):
+        # Clamp to the fastest rate that is still crosstalk-free
+        self.slot_time = max(MIN_SLOT_TIME, 1 / ping_rate)
+
+    @property
+    def per_sensor_rate(self):
+        return self.ping_rate / max(1, len(self.system.sensors))
+
+    def interleave(self, sensors, rounds, slot_time=MIN_SLOT_TIME):
+        """
+        Yield (sensor, distance) for `rounds` pings of every sensor, one ping per
+        slot, without checking for hits. Used to calibrate all sensors together.
+        """
+        clock = self.system.clock
+        next_slot = clock.monotonic()
+        for _ in range(rounds):
+            for sensor in sensors:
+                yield sensor, sensor.measure_distance(slot_time)
+                next_slot += slot_time
+                delay = next_slot - clock.monotonic()
+                if delay > 0:
+                    clock.sleep(delay)
+                else:
+                    next_slot = clock.monotonic()
+
+    def run(self):
+        sensors = self.system.sensors
+        if not sensors:
+            return
+        logger.info("Scheduler started: %.1f pings/s over %d sensors", self.ping_rate, len(sensors))
+        clock = self.system.clock
+        index = 0
+        next_slot = clock.monotonic()
+        while self.system.running:
+            slot_time = self.slot_time  # read once so a rate change applies per slot
+            self.system.check_sensor(sensors[index], timeout=slot_time)
+            index = (index + 1) % len(sensors)
+
+            next_slot += slot_time
+            delay = next_slot - clock.monotonic()
+            if delay > 0:
+                clock.sleep(delay)
+            else:
+                # Slot overran (slow callback); restart the grid instead of bursting pings
+                next_slot = clock.monotonic()
+        logger.info("Scheduler stopped")
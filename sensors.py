@@ -1,69 +1,20 @@
-import gpiod
+import logging
 import time
-import statistics
 from threading import Thread, Lock
-from datetime import datetime
-
-class UltrasonicSensor:
-    def __init__(self, chip, trigger_pin, echo_pin, sensor_id):
-        self.chip = chip
-        self.trigger_pin = trigger_pin
-        self.echo_pin = echo_pin
-        self.sensor_id = sensor_id
-        self.baseline = None
-        self.trigger_line = None
-        self.echo_line = None
-        self.setup_gpio()
-
-    def setup_gpio(self):
-        self.trigger_line = self.chip.get_line(self.trigger_pin)
-        self.echo_line = self.chip.get_line(self.echo_pin)
-        self.trigger_line.request(consumer=f"sensor_{self.sensor_id}_trigger", type=gpiod.LINE_REQ_DIR_OUT)
-        self.echo_line.request(consumer=f"sensor_{self.sensor_id}_echo", type=gpiod.LINE_REQ_DIR_IN)
-
-    def measure_distance(self):
-        self.trigger_line.set_value(1)
-        time.sleep(0.00001)
-        self.trigger_line.set_value(0)
-
-        start_time = time.time()
-        stop_time = time.time()
-
-        while self.echo_line.get_value() == 0 and time.time() - start_time < 0.1:
-            start_time = time.time()
-
-        while self.echo_line.get_value() == 1 and time.time() - start_time < 0.1:
-            stop_time = time.time()
-
-        time_elapsed = stop_time - start_time
-        distance = (time_elapsed * 34300) / 2
-        return distance
-
-    def calibrate(self, num_measurements=10):
-        measurements = []
-        for _ in range(num_measurements):
-            dist = self.measure_distance()
-            measurements.append(dist)
-            time.sleep(0.1)
-
-        self.baseline = statistics.median(measurements)
-        print(f"Sensor {self.sensor_id} baseline: {self.baseline:.2f} cm")
-        return self.baseline
-
-    def cleanup(self):
-        if self.trigger_line:
-            self.trigger_line.release()
-        if self.echo_line:
-            self.echo_line.release()
+from sensor_controller import UltrasonicSensor
+from gpio_backend import default_backend
+from logging_setup import setup_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
 
 def write_sensor_trigger(sensor_id):
     """Function that writes the sensor number when triggered"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] Sensor {sensor_id} triggered!")
+    # The log record carries the timestamp; logging never blocks the sensor thread
+    logger.info("Sensor %d triggered!", sensor_id)
     # You can add additional logging or data writing here if needed
 
 class SensorSystem:
-    def __init__(self):
+    def __init__(self, backend=None):
         # Define pin mappings for 10 sensors
         self.sensor_pins = [
             {"trigger": 23, "echo": 24},  # Sensor 0
@@ -77,7 +28,9 @@ class SensorSystem:
             {"trigger": 12, "echo": 7},   # Sensor 8
             {"trigger": 8, "echo": 25},   # Sensor 9
         ]
-        self.chip = gpiod.Chip('4')  # For Raspberry Pi 5
+        self.backend = backend or default_backend()
+        self.clock = self.backend.clock
+        self.chip = self.backend.open_chip()
         self.sensors = []
         self.running = False
         self.threads = []
@@ -89,26 +42,31 @@ class SensorSystem:
                 self.chip,
                 pins["trigger"],
                 pins["echo"],
-                i
+                i,
+                use_edge_events=True,
+                clock=self.clock
             )
+            self.backend.connect_sensor(self.chip, pins["trigger"], pins["echo"])
             self.sensors.append(sensor)
 
     def calibrate_all_sensors(self):
-        print("Calibrating all sensors...")
+        logger.info("Calibrating all sensors...")
         for sensor in self.sensors:
             sensor.calibrate()
-        print("Calibration complete!")
+        logger.info("Calibration complete!")
 
     def monitor_sensor(self, sensor):
+        if sensor.baseline is None:
+            return  # No echoes during calibration; nothing to compare readings with
         while self.running:
             current_distance = sensor.measure_distance()
             threshold = sensor.baseline * 0.10  # 10% threshold
 
-            if abs(current_distance - sensor.baseline) > threshold:
+            if current_distance is not None and abs(current_distance - sensor.baseline) > threshold:
                 with self.lock:
                     write_sensor_trigger(sensor.sensor_id)
 
-            time.sleep(0.1)  # Adjust this delay as needed
+            self.clock.sleep(0.1)  # Adjust this delay as needed
 
     def start_monitoring(self):
         self.running = True
@@ -132,6 +90,7 @@ class SensorSystem:
         self.chip.close()
 
 if __name__ == '__main__':
+    setup_logging()
     try:
         # Initialize and start the sensor system
         system = SensorSystem()
@@ -148,4 +107,6 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         print("\nStopping monitoring...")
         system.stop_monitoring()
-        print("Cleanup complete")
\ No newline at end of file
+        print("Cleanup complete")
+    finally:
+        shutdown_logging()
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""Start-up work that runs in the background, so the first frame does not wait for it.
+
+Sensor bring-up (GPIO setup and calibration) and image decoding take seconds,
+which the start screen used to wait for. Startup runs them on worker threads
+while the game loop draws, and keeps a short status per task for the screen:
+
+    startup = Startup()
+    startup.add("Sensors", initialize_sensors, lambda step: startup.report("Sensors", step))
+    startup.add("Images", load_images)
+    ...
+    if startup.done("Images"):
+        images = startup.result("Images")
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    def __init__(self, max_workers=2, show_failed=5.0):
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="startup")
+        self.tasks = {}  # name -> Future, in the order they were added
+        self.steps = {}  # name -> what the task last reported doing
+        self.finished_at = {}  # name -> monotonic time the task ended
+        self.show_failed = show_failed  # seconds a failed task stays in status_lines()
+
+    def add(self, name, function, *args):
+        """Run function(*args) on a worker; it may call report(name, step) as it goes"""
+        self.steps[name] = "waiting"
+        self.tasks[name] = self.executor.submit(self.run, name, function, *args)
+        self.tasks[name].add_done_callback(lambda future: self.finished_at.setdefault(name, time.monotonic()))
+
+    def run(self, name, function, *args):
+        self.steps[name] = "loading"
+        try:
+            return function(*args)
+        except Exception:
+            logger.exception("Start-up task %s failed", name)
+            raise
+
+    def report(self, name, step):
+        self.steps[name] = step
+
+    def done(self, name):
+        return self.tasks[name].done()
+
+    def result(self, name):
+        """What the task returned, or None if it failed; only call once done()"""
+        future = self.tasks[name]
+        return None if future.cancelled() or future.exception() else future.result()
+
+    def status(self, name):
+        future = self.tasks[name]
+        if not future.done():
+            return self.steps[name]
+        return "failed" if future.cancelled() or future.exception() else "ready"
+
+    def finished(self):
+        return all(future.done() for future in self.tasks.values())
+
+    def status_lines(self):
+        """
+        One "name: status" line per task still running, for the screen. A task
+        that failed keeps its line for show_failed seconds, so it can be seen.
+        """
+        now = time.monotonic()
+        return tuple(f"{name}: {self.status(name)}" for name, future in self.tasks.items()
+                     if not future.done()
+                     or (self.status(name) == "failed" and now - self.finished_at.get(name, now) < self.show_failed))
+
+    def shutdown(self):
+        """Wait for the running tasks and drop the ones not started yet"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,80 @@
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces, keyed on font, text and colour.
+    Most text on screen is the same from one frame to the next, so it is only
+    rendered again after it changes or falls out of the cache.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, antialias, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+# Shared by every screen
+text_cache = TextCache()
+
+_fonts = {}
+
+
+def get_font(size, name=None):
+    """Load a font once and reuse it"""
+    key = (name, size)
+    if key not in _fonts:
+        _fonts[key] = pygame.font.Font(name, size)
+    return _fonts[key]
+
+
+class LeaderboardPanel:
+    """
+    The high-score list composited onto one surface.
+    The panel is rebuilt only when the leaderboard version changes; every
+    other frame it is drawn with a single blit.
+    """
+
+    def __init__(self, leaderboard, color, font_size=36, line_spacing=40, title="High Scores"):
+        self.leaderboard = leaderboard
+        self.color = color
+        self.font_size = font_size
+        self.line_spacing = line_spacing
+        self.title = title
+        self.surface = None
+        self.version = None
+
+    def build(self):
+        font = get_font(self.font_size)
+        lines = [text_cache.render(font, text, self.color)
+                 for text in [self.title] + self.leaderboard.rows()]
+        panel_width = max(line.get_width() for line in lines)
+        line_height = max(line.get_height() for line in lines)
+        panel_height = (len(lines) - 1) * self.line_spacing + line_height
+        self.surface = pygame.Surface((panel_width, panel_height), pygame.SRCALPHA)
+        for i, line in enumerate(lines):
+            rect = line.get_rect(center=(panel_width // 2, line_height // 2 + i * self.line_spacing))
+            self.surface.blit(line, rect)
+        self.line_height = line_height
+        self.version = self.leaderboard.version
+
+    def draw(self, surface, x, y):
+        """Draw with the title centred on (x, y), like draw_text does"""
+        if self.surface is None or self.version != self.leaderboard.version:
+            self.build()
+        return surface.blit(self.surface, (x - self.surface.get_width() // 2, y - self.line_height // 2))